@@ -5,31 +5,239 @@ Supabase queries only (no cross-service delegation).
 """
 
 from fastapi import HTTPException
-from app.utils import get_supabase_client
+from app.utils import get_supabase_async_client
+from cachetools import TTLCache
 import os
+import threading
 
-def is_member(user_id: str, group_id: str) -> bool:
+# Short-TTL cache for membership lookups. is_member runs on essentially every
+# protected endpoint, so repeated checks for the same (user_id, group_id)
+# within a burst skip the Supabase roundtrip. The short TTL bounds staleness
+# when membership changes in the Group service.
+AUTHZ_CACHE_TTL = int(os.getenv("AUTHZ_CACHE_TTL", "30"))
+_member_cache = TTLCache(maxsize=10_000, ttl=AUTHZ_CACHE_TTL)
+_member_cache_lock = threading.Lock()
+
+# Negative cache: full member set per group, loaded with one query on the
+# first check for that group. Groups here are small, so an exact set gives
+# the "definitely not a member" answer (and the positive one) from memory
+# without the false positives a Bloom filter would trade in.
+_group_members_cache = TTLCache(maxsize=2_048, ttl=AUTHZ_CACHE_TTL)
+
+# Expense->group mappings never change once created, so they can sit in the
+# shared cache longer than membership results.
+EXPENSE_GROUP_CACHE_TTL = int(os.getenv("EXPENSE_GROUP_CACHE_TTL", "300"))
+_expense_group_cache = TTLCache(maxsize=10_000, ttl=EXPENSE_GROUP_CACHE_TTL)
+
+_redis = None
+
+async def _get_redis():
+    """Return the shared async Redis client when REDIS_URL is set, else None.
+
+    In-process caches miss across workers/replicas; Redis acts as an L2 so
+    hot groups stay warm for every process. Optional like asyncpg: without
+    the package or the URL the in-process cache alone is used.
+    """
+    global _redis
+    if _redis is not None:
+        return _redis
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    try:
+        import redis.asyncio as aioredis  # type: ignore
+    except Exception:
+        return None
+    try:
+        _redis = aioredis.from_url(url, max_connections=50, decode_responses=True)
+    except Exception:
+        return None
+    return _redis
+
+_pg_pool = None
+
+async def _get_pg_pool():
+    """Return an asyncpg pool when SUPAVISOR_DSN is configured, else None.
+
+    The authz queries are indexed point-lookups, so going straight to
+    Postgres through a Supavisor/pgbouncer pool skips the PostgREST+HTTPS
+    hop. statement_cache_size=0 is required behind transaction-mode
+    pooling. Falls back to the REST client when asyncpg or the DSN are
+    unavailable, so this stays an optional fast path.
+    """
+    global _pg_pool
+    if _pg_pool is not None:
+        return _pg_pool
+    dsn = os.getenv("SUPAVISOR_DSN")
+    if not dsn:
+        return None
+    try:
+        import asyncpg  # type: ignore
+    except Exception:
+        return None
+    try:
+        _pg_pool = await asyncpg.create_pool(dsn=dsn, min_size=2, max_size=10, statement_cache_size=0)
+    except Exception:
+        return None
+    return _pg_pool
+
+async def is_member(user_id: str, group_id: str) -> bool:
     """Return True if the user belongs to the given group."""
-    supabase = get_supabase_client()
-    res = supabase.table("group_members").select("user_id").eq("group_id", group_id).eq("user_id", user_id).execute()
-    return bool(res.data)
+    key = f"{user_id}:{group_id}"
+    with _member_cache_lock:
+        cached = _member_cache.get(key)
+    if cached is not None:
+        return cached
+    redis = await _get_redis()
+    if redis is not None:
+        try:
+            hit = await redis.get(f"m:{group_id}:{user_id}")
+        except Exception:
+            hit = None
+        if hit is not None:
+            result = hit == "1"
+            with _member_cache_lock:
+                _member_cache[key] = result
+            return result
+    with _member_cache_lock:
+        members = _group_members_cache.get(group_id)
+    if members is not None:
+        result = user_id in members
+        with _member_cache_lock:
+            _member_cache[key] = result
+        return result
+    pool = await _get_pg_pool()
+    if pool is not None:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("SELECT user_id FROM group_members WHERE group_id=$1", group_id)
+        members = frozenset(r["user_id"] for r in rows)
+    else:
+        supabase = await get_supabase_async_client()
+        res = await supabase.table("group_members").select("user_id").eq("group_id", group_id).execute()
+        members = frozenset(row["user_id"] for row in (res.data or []))
+    result = user_id in members
+    with _member_cache_lock:
+        _group_members_cache[group_id] = members
+        _member_cache[key] = result
+    if redis is not None:
+        try:
+            await redis.setex(f"m:{group_id}:{user_id}", AUTHZ_CACHE_TTL, "1" if result else "0")
+        except Exception:
+            pass
+    return result
+
+async def invalidate_membership(user_id: str, group_id: str):
+    """Drop cached membership results (call after membership mutations)."""
+    with _member_cache_lock:
+        _member_cache.pop(f"{user_id}:{group_id}", None)
+        _group_members_cache.pop(group_id, None)
+    redis = await _get_redis()
+    if redis is not None:
+        try:
+            await redis.delete(f"m:{group_id}:{user_id}")
+        except Exception:
+            pass
+
+async def are_members(user_id: str, group_ids) -> set:
+    """Return the subset of group_ids the user belongs to, in one query.
 
-def get_expense_group(expense_id: str) -> str | None:
+    Batch counterpart to is_member: checking N groups costs a single
+    roundtrip instead of N. Results feed the same membership cache.
+    """
+    group_ids = list(group_ids)
+    if not group_ids:
+        return set()
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("group_members").select("group_id").eq("user_id", user_id).in_("group_id", group_ids).execute()
+    member_of = {row["group_id"] for row in (res.data or [])}
+    with _member_cache_lock:
+        for gid in group_ids:
+            _member_cache[f"{user_id}:{gid}"] = gid in member_of
+    return member_of
+
+async def ensure_members_or_403(user_id: str, group_ids):
+    """Raise 403 unless the user is a member of every given group."""
+    group_ids = set(group_ids)
+    if await are_members(user_id, group_ids) != group_ids:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+async def get_expense_group(expense_id: str) -> str | None:
     """Return the group_id owning the expense or None if not found."""
-    supabase = get_supabase_client()
-    exp = supabase.table("expenses").select("group_id").eq("id", expense_id).execute()
-    if not exp.data:
-        return None
-    return exp.data[0]["group_id"]
+    with _member_cache_lock:
+        gid = _expense_group_cache.get(expense_id)
+    if gid is not None:
+        return gid
+    redis = await _get_redis()
+    if redis is not None:
+        try:
+            hit = await redis.get(f"eg:{expense_id}")
+        except Exception:
+            hit = None
+        if hit is not None:
+            return hit
+    pool = await _get_pg_pool()
+    if pool is not None:
+        async with pool.acquire() as conn:
+            gid = await conn.fetchval("SELECT group_id FROM expenses WHERE id=$1", expense_id)
+    else:
+        supabase = await get_supabase_async_client()
+        exp = await supabase.table("expenses").select("group_id").eq("id", expense_id).execute()
+        gid = exp.data[0]["group_id"] if exp.data else None
+    if gid is not None:
+        with _member_cache_lock:
+            _expense_group_cache[expense_id] = gid
+        if redis is not None:
+            try:
+                await redis.setex(f"eg:{expense_id}", EXPENSE_GROUP_CACHE_TTL, gid)
+            except Exception:
+                pass
+    return gid
 
-def ensure_member_or_403(user_id: str, group_id: str):
+async def ensure_member_or_403(user_id: str, group_id: str):
     """Raise 403 if the user is not a member of the group."""
-    if not is_member(user_id, group_id):
+    if not await is_member(user_id, group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-def ensure_member_by_expense_or_403(user_id: str, expense_id: str):
-    """Resolve the expense's group and raise 403 if user is not a member."""
-    gid = get_expense_group(expense_id)
-    if not gid:
+async def ensure_member_by_expense_or_403(user_id: str, expense_id: str):
+    """Resolve the expense's group and raise 403 if user is not a member.
+
+    Uses one embedded PostgREST query (expenses joined to group_members on
+    group_id) instead of two sequential roundtrips. Only on the empty-result
+    path do we probe once more to tell 404 apart from 403. One fused query
+    also beats firing the two legacy lookups concurrently: same wall-clock
+    latency as the slower of the pair, half the requests. When both the
+    expense's group and the membership answer are already cached the whole
+    check is served from memory.
+    """
+    with _member_cache_lock:
+        gid = _expense_group_cache.get(expense_id)
+    if gid is not None:
+        await ensure_member_or_403(user_id, gid)
+        return
+    supabase = await get_supabase_async_client()
+    try:
+        res = await (
+            supabase.table("expenses")
+            .select("group_id, group_members!inner(user_id)")
+            .eq("id", expense_id)
+            .eq("group_members.user_id", user_id)
+            .execute()
+        )
+    except Exception:
+        # PostgREST can only resolve the embed when an expenses<->group_members
+        # relationship is declared (see sql/); without it the fused query
+        # fails, so fall back to the two legacy lookups.
+        gid = await get_expense_group(expense_id)
+        if gid is None:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        await ensure_member_or_403(user_id, gid)
+        return
+    if res.data:
+        gid = res.data[0]["group_id"]
+        with _member_cache_lock:
+            _expense_group_cache[expense_id] = gid
+            _member_cache[f"{user_id}:{gid}"] = True
+        return
+    if await get_expense_group(expense_id) is None:
         raise HTTPException(status_code=404, detail="Expense not found")
-    ensure_member_or_403(user_id, gid)
+    raise HTTPException(status_code=403, detail="Not a member of this group")
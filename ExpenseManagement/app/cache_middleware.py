@@ -0,0 +1,60 @@
+"""Short-TTL response cache for idempotent GET endpoints.
+
+Most expense GETs (lists, balances, reports) are pure reads gated by a
+membership check, so a cache hit skips both the authz and the data
+roundtrips. Responses are keyed per caller (Authorization header), path and
+query string. Any successful mutation through this service drops the whole
+cache; the short TTL bounds staleness for writes made elsewhere.
+"""
+
+import os
+import threading
+
+from cachetools import TTLCache
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+
+
+class GetResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Cache 200 responses to GET requests for RESPONSE_CACHE_TTL seconds."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+        self._lock = threading.Lock()
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET":
+            response = await call_next(request)
+            # A successful write likely invalidates cached reads. OPTIONS
+            # (CORS preflight) and HEAD don't mutate anything — clearing on
+            # them would wipe the cache for every browser request.
+            if response.status_code < 400 and request.method not in ("OPTIONS", "HEAD"):
+                with self._lock:
+                    self._cache.clear()
+            return response
+        # Endpoints negotiate gzip bodies off Accept-Encoding, so the
+        # encoding has to be part of the key or a gzip variant would be
+        # served to clients that can't decode it
+        accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+        key = (request.headers.get("authorization", ""), request.url.path, str(request.url.query), accepts_gzip)
+        with self._lock:
+            hit = self._cache.get(key)
+        if hit is not None:
+            body, status, headers = hit
+            # Honor conditional requests on cache hits too
+            etag = headers.get("etag")
+            if etag and request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, status_code=status, headers=headers)
+        response = await call_next(request)
+        if response.status_code == 200:
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            headers = dict(response.headers)
+            with self._lock:
+                self._cache[key] = (body, response.status_code, headers)
+            return Response(content=body, status_code=response.status_code, headers=headers)
+        return response
@@ -1,25 +1,38 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Literal
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_EVEN, getcontext
+
+# Shared Decimal context for monetary fields: bankers' rounding at fixed
+# precision, configured once at import so per-request math never re-tunes it.
+_CTX = getcontext()
+_CTX.prec = 18
+_CTX.rounding = ROUND_HALF_EVEN
 
 
 # Minimal request payload for creating an expense via path group_id
 class ExpenseCreateRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     description: str
-    amount: float
+    amount: Decimal = Field(..., max_digits=14, decimal_places=2)
 
 
 # This model validates expense split input
 class ExpenseSplit(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     expense_id: str
     user_id: str
-    amount: float
+    amount: Decimal = Field(..., max_digits=14, decimal_places=2)
     is_settled: Optional[bool] = False
 
 
 class ExpenseUpdate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     description: Optional[str] = None
-    amount: Optional[float] = None
+    amount: Optional[Decimal] = Field(None, max_digits=14, decimal_places=2)
     currency: Optional[str] = None
     date: Optional[datetime] = None
     paid_by: Optional[str] = None
@@ -29,11 +42,13 @@ class ExpenseUpdate(BaseModel):
 
 # This model represents an expense record
 class Expense(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     group_id: str
     created_by: str
     description: str
-    amount: float
+    amount: Decimal = Field(..., max_digits=14, decimal_places=2)
     currency: Optional[str] = None
     date: Optional[datetime] = None
     paid_by: Optional[str] = None
@@ -44,6 +59,8 @@ class Expense(BaseModel):
 
 # Split preview/commit models
 class SplitParticipant(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     user_id: str
     # Exactly one of percent, shares, or exact_amount should be provided per participant for non-equal modes
     percent: Optional[float] = None
@@ -52,15 +69,32 @@ class SplitParticipant(BaseModel):
 
 
 class SplitPreviewRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     mode: Literal["equal", "percent", "shares", "exact"] = "equal"
     amount: Optional[float] = None  # if omitted, use expense.amount
     participants: List[SplitParticipant]
 
 
 class SplitItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     user_id: str
-    amount: float
+    amount: Decimal = Field(..., max_digits=14, decimal_places=2)
 
 
 class SplitCommitRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     splits: List[SplitItem]
+
+
+# One settlement payment between two members
+class SettlementItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    payer_id: str
+    payee_id: str
+    amount: Decimal = Field(..., max_digits=14, decimal_places=2)
+    method: Optional[str] = None
+    note: Optional[str] = None
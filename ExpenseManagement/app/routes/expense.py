@@ -5,28 +5,131 @@ Permanent fix included:
 - We can safely insert created_by/paid_by on initial insert (FK will pass).
 """
 
-from datetime import datetime
+import asyncio
+import base64
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import gzip
+import hashlib
+import heapq
 import io
+import json
+import math
+import os
+import random
 import re
 import uuid
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from app.authz_utils import ensure_member_by_expense_or_403, ensure_member_or_403
+
 from app.models import (
     ExpenseCreateRequest,
     ExpenseSplit,
     ExpenseUpdate,
+    SettlementItem,
     SplitCommitRequest,
     SplitPreviewRequest,
 )
-from app.utils import RECEIPTS_BUCKET, get_current_user, get_supabase_admin, get_supabase_client
+from app.utils import RECEIPTS_BUCKET, get_current_user, get_supabase_admin, get_supabase_async_client
 
 router = APIRouter()
 
+# Rows per bulk-insert request. Keeps each PostgREST payload well under
+# request-size/timeout limits; batches are issued concurrently.
+_INSERT_CHUNK = 500
+
+def _to_cents(x) -> int:
+    """Amount as integer cents; exact adds and comparisons, no FP rounding."""
+    return int(round(float(x or 0) * 100))
+
+def _uuids(n: int) -> list[str]:
+    """Generate n random UUID strings from one os.urandom read.
+
+    uuid.uuid4() takes the urandom lock per call; batching the entropy
+    amortizes that for multi-row inserts.
+    """
+    raw = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)) for i in range(n)]
+
+# Precompiled error-parsing patterns for create_expense's self-heal loop,
+# which may match these against the error text several times per insert
+_NULL_COL_RE = re.compile(r"null value in column\s+'?\"?([A-Za-z0-9_]+)\"?'?")
+_MISSING_COL_RE = re.compile(r"Could not find the '([^']+)' column")
+_MISSING_COL_RE2 = re.compile(r'column\s+"?([A-Za-z0-9_]+)"?\s+does not exist', re.IGNORECASE)
+
+try:
+    import numpy as _np  # type: ignore  # optional: vectorizes split math
+except Exception:
+    _np = None
+
+def _weighted_amounts(total: float, weights: list[float]) -> list[float]:
+    """Divide total proportionally to weights, rounded to cents.
+
+    Any rounding drift lands on the last participant so amounts always sum
+    back to the total. With NumPy installed the division runs as one
+    vectorized pass instead of a Python loop per participant.
+    """
+    if _np is not None:
+        w = _np.asarray(weights, dtype=_np.float64)
+        amounts = _np.round(total * w / w.sum(), 2)
+        amounts[-1] = round(amounts[-1] + (total - float(amounts.sum())), 2)
+        return [float(a) for a in amounts]
+    wsum = sum(weights)
+    amounts = [round(total * w / wsum, 2) for w in weights]
+    amounts[-1] = round(amounts[-1] + (total - sum(amounts)), 2)
+    return amounts
+
+# Internal carrier for split math. The wire schema (SplitParticipant) is
+# validated once at the HTTP boundary; downstream arithmetic runs on cheap
+# slotted instances instead of re-touching Pydantic per participant.
+@dataclass(slots=True, frozen=True)
+class _SplitParticipant:
+    user_id: str
+    percent: float | None
+    shares: float | None
+    exact_amount: float | None
+
+# Optional expense columns the schema turned out not to have. Probed once
+# per process (lazily, on the first create) so every later insert sends the
+# right payload in a single round trip instead of re-learning it from
+# insert errors each time.
+_EXPENSE_OPTIONAL_COLS = ("currency", "date", "created_by", "paid_by")
+_EXPENSE_DROPPED_COLS: set[str] = set()
+_expense_cols_probed = False
+
+async def _probe_expense_columns(supabase):
+    """Find which optional expense columns exist (cached after first call).
+
+    Only a definite missing-column error marks a column dropped; a
+    transient failure (network, auth) leaves the probe uncached so the
+    next create retries instead of permanently inserting without
+    attribution.
+    """
+    global _expense_cols_probed
+    if _expense_cols_probed:
+        return
+    complete = True
+    for col in _EXPENSE_OPTIONAL_COLS:
+        try:
+            # limit(0) transfers no rows; a missing column still errors
+            await supabase.table("expenses").select(col).limit(0).execute()
+        except Exception as e:
+            msg = str(e)
+            if _MISSING_COL_RE.search(msg) or _MISSING_COL_RE2.search(msg):
+                _EXPENSE_DROPPED_COLS.add(col)
+            else:
+                complete = False
+    if complete:
+        _expense_cols_probed = True
+
 @router.post("/groups/{group_id}/expenses", summary="Create an expense in a group", tags=["Expenses"])
-def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None, user=Depends(get_current_user)):
+async def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None, user=Depends(get_current_user)):
     """Create an expense with only two required fields in the body.
 
     With get_current_user now auto-syncing a row in public.users, we can safely set
@@ -39,31 +142,39 @@ def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None
         raise HTTPException(status_code=422, detail="group_id is required (path or body)")
 
     # Ensure caller is a member of the group
-    ensure_member_or_403(user["sub"], gid)
+    await ensure_member_or_403(user["sub"], gid)
 
-    supabase = get_supabase_client()
+    supabase = await get_supabase_async_client()
     caller_id = user.get("sub")
 
-    # Base data to insert; optional fields will be dropped if the DB doesn't have them
+    # Base data to insert; optional fields will be dropped if the DB doesn't have them.
+    # One clock read for the whole call (utcnow is deprecated and the retry
+    # loop below reuses this value instead of re-reading the clock).
+    now_iso = datetime.now(timezone.utc).isoformat()
     data_full = {
         "id": expense_id,
         "group_id": gid,
         "description": expense.description,
-        "amount": expense.amount,
+        "amount": float(expense.amount),
         "created_by": caller_id,
         "paid_by": caller_id,
         "currency": "USD",
-        "date": datetime.utcnow().isoformat(),
+        "date": now_iso,
     }
-    optional = ["currency", "date", "created_by", "paid_by"]
-    dropped: set[str] = set()
+    optional = list(_EXPENSE_OPTIONAL_COLS)
+    # Start from the columns already known to be absent so the usual case
+    # is a single insert; the loop below stays as the safety net and keeps
+    # feeding what it learns back into the module-level cache.
+    await _probe_expense_columns(supabase)
+    dropped: set[str] = set(_EXPENSE_DROPPED_COLS)
     last_detail = None
 
-    for _ in range(len(optional) + 3):
+    for attempt in range(len(optional) + 3):
         data = {k: v for k, v in data_full.items() if k not in dropped}
         try:
-            res = supabase.table("expenses").insert(data).execute()
+            res = await supabase.table("expenses").insert(data).execute()
             if not getattr(res, "error", None):
+                _EXPENSE_DROPPED_COLS.update(dropped)
                 return {"expense_id": data["id"], "msg": "Expense created successfully"}
             detail = getattr(res, "error", None) or getattr(res, "data", None) or "Unknown insert error"
         except Exception as e:
@@ -76,12 +187,20 @@ def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None
             data_full["id"] = str(uuid.uuid4())
             continue
 
+        # Transient serialization/deadlock failures: retry after a short
+        # jittered exponential pause instead of hot-spinning
+        lowered = as_text.lower()
+        if code in ("40001", "40P01") or "deadlock detected" in lowered or "could not serialize" in lowered:
+            await asyncio.sleep(random.uniform(0, min(0.1 * (2 ** attempt), 2.0)))
+            last_detail = detail
+            continue
+
         # NOT NULL violations: self-heal for known optional cols
         if (code == "23502") or ("null value in column" in as_text.lower()):
-            mnn = re.search(r"null value in column\s+'?\"?([A-Za-z0-9_]+)\"?'?", as_text)
+            mnn = _NULL_COL_RE.search(as_text)
             col = mnn.group(1) if mnn else None
             if col == "date" and "date" not in dropped:
-                data_full["date"] = datetime.utcnow().isoformat()
+                data_full["date"] = now_iso
                 last_detail = detail
                 continue
             if col == "currency" and "currency" not in dropped:
@@ -91,11 +210,11 @@ def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None
 
         # Unknown/missing column → drop and retry
         missing = None
-        m = re.search(r"Could not find the '([^']+)' column", as_text)
+        m = _MISSING_COL_RE.search(as_text)
         if m:
             missing = m.group(1)
         else:
-            m2 = re.search(r'column\s+"?([A-Za-z0-9_]+)"?\s+does not exist', as_text, re.IGNORECASE)
+            m2 = _MISSING_COL_RE2.search(as_text)
             if m2:
                 missing = m2.group(1)
         if missing and missing in data_full and missing not in dropped:
@@ -116,326 +235,514 @@ def create_expense(expense: ExpenseCreateRequest, group_id: Optional[str] = None
     raise HTTPException(status_code=500, detail=f"Failed to create expense: {last_detail}")
 
 @router.get("/expenses/{expense_id}", summary="Get a single expense with splits", tags=["Expenses"])
-def get_expense(expense_id: str, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    exp = supabase.table("expenses").select("*").eq("id", expense_id).execute()
+async def get_expense(expense_id: str, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    # The expense and its splits are independent lookups — overlap them
+    exp, splits = await asyncio.gather(
+        supabase.table("expenses").select("*").eq("id", expense_id).execute(),
+        supabase.table("expense_splits").select("user_id, amount, is_settled").eq("expense_id", expense_id).execute(),
+    )
     if not exp.data:
         raise HTTPException(status_code=404, detail="Expense not found")
-    splits = supabase.table("expense_splits").select("user_id, amount, is_settled").eq("expense_id", expense_id).execute()
     return {"expense": exp.data[0], "splits": splits.data or []}
 
 @router.patch("/expenses/{expense_id}", summary="Update an expense", tags=["Expenses"])
-def update_expense(expense_id: str, payload: ExpenseUpdate, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    update = {k: v for k, v in payload.model_dump(exclude_none=True).items()}
+async def update_expense(expense_id: str, payload: ExpenseUpdate, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    # mode="json" renders Decimal/datetime values in wire-safe form for PostgREST
+    update = payload.model_dump(exclude_none=True, mode="json")
     if not update:
         return {"msg": "No changes"}
-    supabase = get_supabase_client()
-    res = supabase.table("expenses").update(update).eq("id", expense_id).execute()
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("expenses").update(update).eq("id", expense_id).execute()
     if not res.data:
         raise HTTPException(status_code=400, detail="Failed to update expense")
     return {"msg": "Expense updated"}
 
 @router.delete("/expenses/{expense_id}", summary="Delete an expense", tags=["Expenses"])
-def delete_expense(expense_id: str, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    res = supabase.table("expenses").delete().eq("id", expense_id).execute()
+async def delete_expense(expense_id: str, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    # Splits go with the expense via ON DELETE CASCADE (see
+    # sql/expense_splits_cascade.sql): one atomic round trip
+    res = await supabase.table("expenses").delete().eq("id", expense_id).execute()
     if not res.data:
         raise HTTPException(status_code=400, detail="Failed to delete expense")
-    supabase.table("expense_splits").delete().eq("expense_id", expense_id).execute()
+    # Best-effort sweep in case the cascade migration hasn't been applied
+    # yet; a no-op once it has, and orphaned splits would otherwise keep
+    # counting toward balances with no error anywhere.
+    try:
+        await supabase.table("expense_splits").delete().eq("expense_id", expense_id).execute()
+    except Exception:
+        pass
     return {"msg": "Expense deleted"}
 
 @router.post("/expenses/{expense_id}/splits", summary="Add a split to an expense", tags=["Expenses"])
-def split_expense(split: ExpenseSplit, expense_id: Optional[str] = None, user=Depends(get_current_user)):
+async def split_expense(split: ExpenseSplit, expense_id: Optional[str] = None, user=Depends(get_current_user)):
     split_id = str(uuid.uuid4())
     eid = expense_id or getattr(split, "expense_id", None)
     if not eid:
         raise HTTPException(status_code=422, detail="expense_id is required (path or body)")
-    ensure_member_by_expense_or_403(user["sub"], eid)
+    await ensure_member_by_expense_or_403(user["sub"], eid)
     data = {
         "id": split_id,
         "expense_id": eid,
         "user_id": split.user_id,
-        "amount": split.amount,
+        "amount": float(split.amount),
         "is_settled": split.is_settled
     }
-    supabase = get_supabase_client()
-    res = supabase.table("expense_splits").insert(data).execute()
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("expense_splits").insert(data).execute()
     if getattr(res, "error", None):
         raise HTTPException(status_code=500, detail=f"Failed to split expense: {getattr(res, 'error', None)}")
     return {"split_id": split_id, "msg": "Expense split added successfully"}
 
+def _encode_cursor(row: dict) -> str | None:
+    # date is one of the droppable optional columns, so a NULL ends the
+    # keyset walk: encoding it would produce a "None|<id>" cursor that
+    # PostgREST rejects on the next page.
+    if row.get("date") is None:
+        return None
+    return base64.urlsafe_b64encode(f"{row.get('date')}|{row.get('id')}".encode()).decode()
+
 @router.get("/groups/{group_id}/expenses", summary="List expenses for a group", tags=["Expenses"])
-def get_group_expenses(group_id: str, page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100),
-                       sort: Optional[str] = None, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    query = supabase.table("expenses").select("*").eq("group_id", group_id)
+async def get_group_expenses(group_id: str, page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100),
+                       sort: Optional[str] = None,
+                       cursor: Optional[str] = Query(None, description="Keyset cursor; pass empty for first page"),
+                       user=Depends(get_current_user)):
+    supabase = await get_supabase_async_client()
+    # Keyset (cursor) pagination: seeks straight to the page via the
+    # (group_id, date, id) index instead of scanning and discarding OFFSET
+    # rows, so deep pages cost the same as the first one (see
+    # sql/expenses_keyset_index.sql). Supplying `cursor` (even empty)
+    # selects this mode; the page/page_size form stays for old callers.
+    if cursor is not None:
+        await ensure_member_or_403(user["sub"], group_id)
+        desc = sort != "date_asc"
+        query = supabase.table("expenses").select("*").eq("group_id", group_id)
+        if cursor:
+            try:
+                cur_date, cur_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+            except Exception:
+                raise HTTPException(status_code=422, detail="Invalid cursor")
+            if cur_date == "None":
+                raise HTTPException(status_code=422, detail="Invalid cursor")
+            # Tuple comparison (date, id) <, expressed as a PostgREST or-filter
+            op = "lt" if desc else "gt"
+            query = query.or_(f"date.{op}.{cur_date},and(date.eq.{cur_date},id.{op}.{cur_id})")
+        rows = (await query.order("date", desc=desc).order("id", desc=desc).limit(page_size).execute()).data or []
+        next_cursor = _encode_cursor(rows[-1]) if len(rows) == page_size else None
+        return {"data": rows, "next_cursor": next_cursor}
     start = (page - 1) * page_size
     end = start + page_size - 1
+    # Preferred path: one RPC that joins the membership check with the data
+    # fetch inside Postgres (see sql/rpc_list_group_expenses.sql)
+    try:
+        query = supabase.rpc("rpc_list_group_expenses", {"uid": user["sub"], "gid": group_id})
+        if sort == "date_desc":
+            query = query.order("date", desc=True)
+        elif sort == "date_asc":
+            query = query.order("date", desc=False)
+        res = await query.range(start, end).execute()
+        if res.data:
+            return res.data
+        # Empty can mean "not a member" as well as "no expenses"; disambiguate
+        await ensure_member_or_403(user["sub"], group_id)
+        return []
+    except HTTPException:
+        raise
+    except Exception:
+        # Function not installed; fall back to the two-step path
+        pass
+    await ensure_member_or_403(user["sub"], group_id)
+    query = supabase.table("expenses").select("*").eq("group_id", group_id)
     if sort == "date_desc":
         query = query.order("date", desc=True)
     elif sort == "date_asc":
         query = query.order("date", desc=False)
-    res = query.range(start, end).execute()
+    res = await query.range(start, end).execute()
     return res.data
 
 @router.get("/users/{user_id}/expenses", summary="List expenses for a user", tags=["Expenses"])
-def get_user_expenses(user_id: str, user=Depends(get_current_user)):
+async def get_user_expenses(user_id: str, user=Depends(get_current_user)):
     if user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
-    supabase = get_supabase_client()
-    res = supabase.table("expense_splits").select("*").eq("user_id", user_id).execute()
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("expense_splits").select("*").eq("user_id", user_id).execute()
     return res.data
 
 @router.get("/expenses/{expense_id}/splits", summary="List splits for an expense", tags=["Splits"])
-def list_splits(expense_id: str, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    res = supabase.table("expense_splits").select("user_id, amount, is_settled").eq("expense_id", expense_id).execute()
+async def list_splits(expense_id: str, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("expense_splits").select("user_id, amount, is_settled").eq("expense_id", expense_id).execute()
     return res.data or []
 
 @router.get("/users/{user_id}/balances", summary="User net balance (optionally by group)", tags=["Balances"])
-def user_balance(user_id: str, group_id: Optional[str] = Query(None), user=Depends(get_current_user)):
+async def user_balance(user_id: str, group_id: Optional[str] = Query(None), user=Depends(get_current_user)):
     if user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
-    supabase = get_supabase_client()
+    supabase = await get_supabase_async_client()
     if group_id:
-        ensure_member_or_403(user_id, group_id)
-        exps = supabase.table("expenses").select("id, amount").eq("group_id", group_id).eq("paid_by", user_id).execute().data or []
-        paid_total = sum(float(e.get("amount", 0)) for e in exps)
-        group_exps = supabase.table("expenses").select("id").eq("group_id", group_id).execute().data or []
+        await ensure_member_or_403(user_id, group_id)
+    # Preferred path: aggregate inside Postgres (see sql/rpc_user_balance.sql)
+    # so a single tiny row comes back instead of every expense/split row
+    try:
+        res = await supabase.rpc("rpc_user_balance", {"uid": user_id, "gid": group_id}).execute()
+        if res.data:
+            row = res.data[0]
+            balance = round(float(row.get("paid") or 0) - float(row.get("owed") or 0), 2)
+            if group_id:
+                return {"user_id": user_id, "group_id": group_id, "balance": balance}
+            return {"user_id": user_id, "balance": balance}
+    except Exception:
+        # Function not installed; fall back to summing rows in Python
+        pass
+    if group_id:
+        # One query covers both needs: the caller's paid rows are just a
+        # filter over the group's expenses, so the second fetch goes away.
+        group_exps = (await supabase.table("expenses").select("id, amount, paid_by").eq("group_id", group_id).execute()).data or []
+        paid_c = sum(_to_cents(e.get("amount")) for e in group_exps if e.get("paid_by") == user_id)
         exp_ids = [e["id"] for e in group_exps]
-        owed_total = 0.0
+        owed_c = 0
         if exp_ids:
-            owed_rows = supabase.table("expense_splits").select("amount, expense_id").in_("expense_id", exp_ids).eq("user_id", user_id).execute().data or []
-            owed_total = sum(float(r.get("amount", 0)) for r in owed_rows)
-        balance = round(paid_total - owed_total, 2)
-        return {"user_id": user_id, "group_id": group_id, "balance": balance}
+            owed_rows = (await supabase.table("expense_splits").select("amount, expense_id").in_("expense_id", exp_ids).eq("user_id", user_id).execute()).data or []
+            owed_c = sum(_to_cents(r.get("amount")) for r in owed_rows)
+        return {"user_id": user_id, "group_id": group_id, "balance": (paid_c - owed_c) / 100}
     else:
-        exps = supabase.table("expenses").select("amount").eq("paid_by", user_id).execute().data or []
-        paid_total = sum(float(e.get("amount", 0)) for e in exps)
-        owed_rows = supabase.table("expense_splits").select("amount").eq("user_id", user_id).execute().data or []
-        owed_total = sum(float(r.get("amount", 0)) for r in owed_rows)
-        return {"user_id": user_id, "balance": round(paid_total - owed_total, 2)}
+        paid_res, owed_res = await asyncio.gather(
+            supabase.table("expenses").select("amount").eq("paid_by", user_id).execute(),
+            supabase.table("expense_splits").select("amount").eq("user_id", user_id).execute(),
+        )
+        paid_c = sum(_to_cents(e.get("amount")) for e in (paid_res.data or []))
+        owed_c = sum(_to_cents(r.get("amount")) for r in (owed_res.data or []))
+        return {"user_id": user_id, "balance": (paid_c - owed_c) / 100}
 
 @router.post("/expenses/{expense_id}/split/preview", summary="Preview split calculation", tags=["Splits"])
-def preview_split(expense_id: str, body: SplitPreviewRequest, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    exp = supabase.table("expenses").select("amount").eq("id", expense_id).execute()
+async def preview_split(expense_id: str, body: SplitPreviewRequest, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    exp = await supabase.table("expenses").select("amount").eq("id", expense_id).execute()
     if not exp.data:
         raise HTTPException(status_code=404, detail="Expense not found")
     total = body.amount or float(exp.data[0]["amount"])
-    parts = body.participants
+    parts = [_SplitParticipant(p.user_id, p.percent, p.shares, p.exact_amount) for p in body.participants]
+    if body.mode == "exact":
+        # Single pass: convert to cents, accumulate, and build the rows;
+        # validate the (exact, FP-free) sum at the end
+        splits = []
+        cents_sum = 0
+        for p in parts:
+            c = _to_cents(p.exact_amount)
+            cents_sum += c
+            splits.append({"user_id": p.user_id, "amount": c / 100})
+        if cents_sum != _to_cents(total):
+            raise HTTPException(status_code=422, detail="Exact amounts must sum to total")
+        return {"total": total, "splits": splits}
+    # The remaining modes are all weighted divisions of the total: build the
+    # weight list once, then validate its sum (a C-speed builtin over floats)
     if body.mode == "equal":
-        n = len(parts)
-        if n == 0:
+        if not parts:
             raise HTTPException(status_code=422, detail="No participants")
-        share = round(total / n, 2)
-        splits = [
-            {"user_id": p.user_id, "amount": share if i < n - 1 else round(total - share * (n - 1), 2)}
-            for i, p in enumerate(parts)
-        ]
-        return {"total": total, "splits": splits}
+        weights = [1.0] * len(parts)
     elif body.mode == "percent":
-        pct_sum = sum((p.percent or 0) for p in parts)
-        if round(pct_sum, 4) != 100.0:
+        weights = [(p.percent or 0) for p in parts]
+        if round(sum(weights), 4) != 100.0:
             raise HTTPException(status_code=422, detail="Percentages must sum to 100")
-        splits = [{"user_id": p.user_id, "amount": round(total * (p.percent or 0) / 100.0, 2)} for p in parts]
-        return {"total": total, "splits": splits}
     elif body.mode == "shares":
-        total_shares = sum((p.shares or 0) for p in parts)
-        if total_shares <= 0:
+        weights = [(p.shares or 0) for p in parts]
+        if sum(weights) <= 0:
             raise HTTPException(status_code=422, detail="Total shares must be > 0")
-        splits = [{"user_id": p.user_id, "amount": round(total * (p.shares or 0) / total_shares, 2)} for p in parts]
-        return {"total": total, "splits": splits}
-    elif body.mode == "exact":
-        exact_sum = sum((p.exact_amount or 0) for p in parts)
-        if round(exact_sum, 2) != round(total, 2):
-            raise HTTPException(status_code=422, detail="Exact amounts must sum to total")
-        splits = [{"user_id": p.user_id, "amount": round(p.exact_amount or 0, 2)} for p in parts]
-        return {"total": total, "splits": splits}
     else:
         raise HTTPException(status_code=422, detail="Invalid mode")
+    amounts = _weighted_amounts(total, weights)
+    splits = [{"user_id": p.user_id, "amount": a} for p, a in zip(parts, amounts)]
+    return {"total": total, "splits": splits}
 
 @router.put("/expenses/{expense_id}/split", summary="Commit split items for an expense (overwrites)", tags=["Splits"])
-def commit_split(expense_id: str, body: SplitCommitRequest, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    supabase.table("expense_splits").delete().eq("expense_id", expense_id).execute()
+async def commit_split(expense_id: str, body: SplitCommitRequest, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    # Preferred path: one RPC that upserts the new rows and removes the
+    # departed members atomically (see sql/rpc_commit_splits.sql)
+    try:
+        payload = [{"user_id": s.user_id, "amount": float(s.amount)} for s in body.splits]
+        await supabase.rpc("rpc_commit_splits", {"eid": expense_id, "splits": payload}).execute()
+        return {"msg": "Splits committed", "count": len(payload)}
+    except Exception:
+        # Function not installed; fall back to delete-then-insert
+        pass
+    await supabase.table("expense_splits").delete().eq("expense_id", expense_id).execute()
+    ids = _uuids(len(body.splits))
     to_insert = [
-        {"id": str(uuid.uuid4()), "expense_id": expense_id, "user_id": s.user_id, "amount": s.amount, "is_settled": False}
-        for s in body.splits
+        {"id": sid, "expense_id": expense_id, "user_id": s.user_id, "amount": float(s.amount), "is_settled": False}
+        for sid, s in zip(ids, body.splits)
     ]
     if to_insert:
-        res = supabase.table("expense_splits").insert(to_insert).execute()
-        if getattr(res, "error", None):
-            raise HTTPException(status_code=500, detail=f"Failed to commit splits: {getattr(res, 'error', None)}")
+        results = await asyncio.gather(*[
+            supabase.table("expense_splits").insert(to_insert[i:i + _INSERT_CHUNK]).execute()
+            for i in range(0, len(to_insert), _INSERT_CHUNK)
+        ])
+        for res in results:
+            if getattr(res, "error", None):
+                raise HTTPException(status_code=500, detail=f"Failed to commit splits: {getattr(res, 'error', None)}")
     return {"msg": "Splits committed", "count": len(to_insert)}
 
-@router.get("/groups/{group_id}/balances", summary="Net balance per member in group", tags=["Balances"])
-def group_balances(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, paid_by").eq("group_id", group_id).execute().data or []
-    splits = supabase.table("expense_splits").select("expense_id, user_id, amount").execute().data or []
-    paid = {}
-    owed = {}
+async def _group_net_balances(supabase, group_id: str) -> dict:
+    """Net balance per member of the group, as {user_id: balance}.
+
+    Prefers the Postgres aggregate (see sql/rpc_group_net_balances.sql),
+    which returns one row per member; falls back to fetching the rows and
+    bucketing in Python when the function is not installed.
+    """
+    try:
+        res = await supabase.rpc("rpc_group_net_balances", {"gid": group_id}).execute()
+        return {r["user_id"]: float(r.get("balance") or 0) for r in (res.data or [])}
+    except Exception:
+        pass
+    # Embedded resource: PostgREST joins each expense to its splits
+    # server-side, so the fallback is one round trip scoped to the group
+    exps = (
+        await supabase.table("expenses")
+        .select("id, amount, paid_by, expense_splits(user_id, amount)")
+        .eq("group_id", group_id)
+        .execute()
+    ).data or []
+    # Integer cents: exact accumulation, one division at the boundary
+    paid = defaultdict(int)
+    owed = defaultdict(int)
     for e in exps:
-        paid[e.get("paid_by")] = paid.get(e.get("paid_by"), 0.0) + float(e.get("amount", 0))
-    for s in splits:
-        owed[s.get("user_id")] = owed.get(s.get("user_id"), 0.0) + float(s.get("amount", 0))
-    users = set([u for u in paid.keys()] + [u for u in owed.keys()])
-    balances = [{"user_id": u, "balance": round(paid.get(u, 0.0) - owed.get(u, 0.0), 2)} for u in users]
+        paid[e.get("paid_by")] += _to_cents(e.get("amount"))
+        for s in e.get("expense_splits") or []:
+            owed[s.get("user_id")] += _to_cents(s.get("amount"))
+    users = set(paid) | set(owed)
+    return {u: (paid.get(u, 0) - owed.get(u, 0)) / 100 for u in users}
+
+@router.get("/groups/{group_id}/balances", summary="Net balance per member in group", tags=["Balances"])
+async def group_balances(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    net = await _group_net_balances(supabase, group_id)
+    balances = [{"user_id": u, "balance": b} for u, b in net.items()]
     return {"balances": balances}
 
 @router.post("/groups/{group_id}/settlements", summary="Record settlement payments", tags=["Settlements"])
-def record_settlements(group_id: str, items: List[dict], user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    to_insert = []
-    for it in items:
-        to_insert.append({
-            "id": str(uuid.uuid4()),
+async def record_settlements(group_id: str, items: List[SettlementItem], user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    # Typed items: shape/amount validation happens once in pydantic-core
+    # instead of ad-hoc dict.get lookups per field
+    caller = user["sub"]
+    to_insert = [
+        {
+            "id": sid,
             "group_id": group_id,
-            "payer_id": it.get("payer_id"),
-            "payee_id": it.get("payee_id"),
-            "amount": it.get("amount"),
-            "method": it.get("method"),
-            "note": it.get("note"),
-            "created_by": user["sub"],  # safe now
-        })
+            "payer_id": it.payer_id,
+            "payee_id": it.payee_id,
+            "amount": float(it.amount),
+            "method": it.method,
+            "note": it.note,
+            "created_by": caller,  # safe now
+        }
+        for sid, it in zip(_uuids(len(items)), items)
+    ]
     if to_insert:
-        res = supabase.table("settlements").insert(to_insert).execute()
-        if getattr(res, "error", None):
-            raise HTTPException(status_code=500, detail=f"Failed to record settlements: {getattr(res, 'error', None)}")
+        results = await asyncio.gather(*[
+            supabase.table("settlements").insert(to_insert[i:i + _INSERT_CHUNK]).execute()
+            for i in range(0, len(to_insert), _INSERT_CHUNK)
+        ])
+        for res in results:
+            if getattr(res, "error", None):
+                raise HTTPException(status_code=500, detail=f"Failed to record settlements: {getattr(res, 'error', None)}")
     return {"msg": "Settlements recorded", "count": len(to_insert)}
 
 @router.get("/groups/{group_id}/settlements", summary="List settlements", tags=["Settlements"])
-def list_settlements(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    res = supabase.table("settlements").select("*").eq("group_id", group_id).execute()
+async def list_settlements(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("settlements").select("*").eq("group_id", group_id).execute()
     return res.data or []
 
 @router.post("/groups/{group_id}/settlements/suggest", summary="Suggest minimal settlement payments", tags=["Settlements"])
-def suggest_settlements(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, paid_by").eq("group_id", group_id).execute().data or []
-    splits = supabase.table("expense_splits").select("expense_id, user_id, amount").execute().data or []
-    paid = {}
-    owed = {}
-    for e in exps:
-        paid[e.get("paid_by")] = paid.get(e.get("paid_by"), 0.0) + float(e.get("amount", 0))
-    for s in splits:
-        owed[s.get("user_id")] = owed.get(s.get("user_id"), 0.0) + float(s.get("amount", 0))
-    users = set([u for u in paid.keys()] + [u for u in owed.keys()])
-    balances = {u: round(paid.get(u, 0.0) - owed.get(u, 0.0), 2) for u in users}
-    creditors = [[u, amt] for u, amt in balances.items() if amt > 0]
-    debtors = [[u, -amt] for u, amt in balances.items() if amt < 0]
-    def second_item(v): return v[1]
-    creditors.sort(key=second_item, reverse=True)
-    debtors.sort(key=second_item, reverse=True)
+async def suggest_settlements(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    balances = await _group_net_balances(supabase, group_id)
+    # Work in integer cents on max-heaps (negated amounts): always match the
+    # largest creditor with the largest debtor, push back any remainder.
+    # No float rounding or epsilon checks, O((n+m) log n) overall.
+    creditors = [(-int(round(amt * 100)), u) for u, amt in balances.items() if amt > 0]
+    debtors = [(-int(round(-amt * 100)), u) for u, amt in balances.items() if amt < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
     suggestions = []
-    i = j = 0
-    while i < len(creditors) and j < len(debtors):
-        cred_user, cred_amt = creditors[i]
-        debt_user, debt_amt = debtors[j]
-        pay = round(min(cred_amt, debt_amt), 2)
-        if pay > 0:
-            suggestions.append({"payer_id": debt_user, "payee_id": cred_user, "amount": pay})
-            creditors[i][1] = round(cred_amt - pay, 2)
-            debtors[j][1] = round(debt_amt - pay, 2)
-        if creditors[i][1] <= 0.0001:
-            i += 1
-        if debtors[j][1] <= 0.0001:
-            j += 1
+    while creditors and debtors:
+        cred_amt, cred_user = heapq.heappop(creditors)
+        debt_amt, debt_user = heapq.heappop(debtors)
+        pay = min(-cred_amt, -debt_amt)
+        if pay <= 0:
+            break
+        suggestions.append({"payer_id": debt_user, "payee_id": cred_user, "amount": pay / 100})
+        if -cred_amt > pay:
+            heapq.heappush(creditors, (cred_amt + pay, cred_user))
+        if -debt_amt > pay:
+            heapq.heappush(debtors, (debt_amt + pay, debt_user))
     return {"suggestions": suggestions}
 
+# Static category catalogue; serialized once so the endpoint returns
+# prebuilt bytes instead of rebuilding and re-encoding the list per call
+_CATEGORIES: List[dict] = [
+    {"key": "food", "label": "Food & Dining", "icon": "🍽️"},
+    {"key": "groceries", "label": "Groceries", "icon": "🛒"},
+    {"key": "rent", "label": "Rent", "icon": "🏠"},
+    {"key": "utilities", "label": "Utilities", "icon": "💡"},
+    {"key": "transport", "label": "Transport", "icon": "🚌"},
+    {"key": "travel", "label": "Travel", "icon": "✈️"},
+    {"key": "entertainment", "label": "Entertainment", "icon": "🎬"},
+    {"key": "health", "label": "Health", "icon": "🏥"},
+    {"key": "shopping", "label": "Shopping", "icon": "🛍️"},
+    {"key": "other", "label": "Other", "icon": "📦"},
+]
+_CATEGORIES_JSON = json.dumps(_CATEGORIES, ensure_ascii=False).encode("utf-8")
+_CATEGORIES_GZ = gzip.compress(_CATEGORIES_JSON, compresslevel=6)
+_CATEGORIES_ETAG = '"cats-v1"'
+_CATEGORIES_HEADERS = {
+    # The catalogue is immutable per release; let browsers/CDNs keep it.
+    # Vary keeps shared caches from serving the gzip variant to clients
+    # that didn't ask for it.
+    "Cache-Control": "public, max-age=86400, immutable",
+    "ETag": _CATEGORIES_ETAG,
+    "Vary": "Accept-Encoding",
+}
+
 @router.get("/categories", summary="List built-in categories", tags=["Metadata"])
-def list_categories() -> List[dict]:
-    return [
-        {"key": "food", "label": "Food & Dining", "icon": "🍽️"},
-        {"key": "groceries", "label": "Groceries", "icon": "🛒"},
-        {"key": "rent", "label": "Rent", "icon": "🏠"},
-        {"key": "utilities", "label": "Utilities", "icon": "💡"},
-        {"key": "transport", "label": "Transport", "icon": "🚌"},
-        {"key": "travel", "label": "Travel", "icon": "✈️"},
-        {"key": "entertainment", "label": "Entertainment", "icon": "🎬"},
-        {"key": "health", "label": "Health", "icon": "🏥"},
-        {"key": "shopping", "label": "Shopping", "icon": "🛍️"},
-        {"key": "other", "label": "Other", "icon": "📦"},
-    ]
+def list_categories(request: Request) -> Response:
+    if request.headers.get("if-none-match") == _CATEGORIES_ETAG:
+        return Response(status_code=304, headers=_CATEGORIES_HEADERS)
+    # Compressed once at import; hand out the right variant directly
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers = dict(_CATEGORIES_HEADERS)
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=_CATEGORIES_GZ, media_type="application/json", headers=headers)
+    return Response(content=_CATEGORIES_JSON, media_type="application/json", headers=_CATEGORIES_HEADERS)
 
 @router.post("/expenses/{expense_id}/attachments", summary="Attach receipt (upload to storage)", tags=["Attachments"])
 async def add_attachment(expense_id: str, file: UploadFile = File(...), user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
     admin = get_supabase_admin()
-    supabase = get_supabase_client()
-    data = await file.read()
-    if not data:
+    supabase = await get_supabase_async_client()
+    # Read the spooled upload in 64 KiB chunks (off the event loop),
+    # hashing as we go. storage3 only streams BufferedReader/FileIO/bytes —
+    # handing it the SpooledTemporaryFile directly makes it treat the
+    # object as a path — so the bytes we just read are what gets uploaded.
+    upload = file.file
+
+    def _read_and_hash():
+        hasher = hashlib.blake2b(digest_size=16)
+        buf = bytearray()
+        while True:
+            chunk = upload.read(65536)
+            if not chunk:
+                break
+            buf += chunk
+            hasher.update(chunk)
+        return bytes(buf), hasher.hexdigest()
+
+    content, content_hash = await run_in_threadpool(_read_and_hash)
+    size = len(content)
+    if not size:
         raise HTTPException(status_code=400, detail="Empty file")
     ext = ""
     if file.filename and "." in file.filename:
         ext = "." + file.filename.rsplit(".", 1)[-1].lower()
-    obj_name = f"{expense_id}/{uuid.uuid4().hex}{ext}"
+    # One entropy read covers both the object name and the metadata id
+    obj_id, meta_id = _uuids(2)
+    obj_name = f"{expense_id}/{obj_id.replace('-', '')}{ext}"
     try:
         bucket = admin.storage.from_(RECEIPTS_BUCKET)
-        bucket.upload(obj_name, data, {"content_type": file.content_type or "application/octet-stream"})
+        # The storage client is sync; run it on the threadpool so the
+        # event loop keeps serving other requests during the upload
+        await run_in_threadpool(
+            bucket.upload, obj_name, content,
+            {"content_type": file.content_type or "application/octet-stream"},
+        )
         public_url = bucket.get_public_url(obj_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
     meta = {
-        "id": str(uuid.uuid4()),
+        "id": meta_id,
         "expense_id": expense_id,
         "filename": file.filename,
         "content_type": file.content_type,
-        "size": len(data),
+        "size": size,
         "url": public_url,
         "uploaded_by": user["sub"],  # safe now (FK exists)
     }
-    supabase.table("attachments").insert(meta).execute()
-    return {"attachment_id": meta["id"], "filename": file.filename, "url": public_url}
+    await supabase.table("attachments").insert(meta).execute()
+    # Hash is returned (not stored): the attachments schema has no column
+    # for it, and callers can use it for dedup/integrity checks
+    return {"attachment_id": meta["id"], "filename": file.filename, "url": public_url, "content_hash": content_hash}
 
 @router.get("/expenses/{expense_id}/attachments", summary="List attachments", tags=["Attachments"])
-def list_attachments(expense_id: str, user=Depends(get_current_user)):
-    ensure_member_by_expense_or_403(user["sub"], expense_id)
-    supabase = get_supabase_client()
-    res = supabase.table("attachments").select("*").eq("expense_id", expense_id).execute()
+async def list_attachments(expense_id: str, user=Depends(get_current_user)):
+    await ensure_member_by_expense_or_403(user["sub"], expense_id)
+    supabase = await get_supabase_async_client()
+    res = await supabase.table("attachments").select("*").eq("expense_id", expense_id).execute()
     return res.data or []
 
+def _summarize_expenses(exps: list) -> tuple:
+    """Total plus per-category and per-payer sums for a list of expenses.
+
+    Amounts are converted once up front and summed with math.fsum (C loop,
+    error-compensated) instead of rounding per row.
+    """
+    amounts = [float(e.get("amount") or 0) for e in exps]
+    by_category = defaultdict(list)
+    by_payer = defaultdict(list)
+    for e, amt in zip(exps, amounts):
+        by_category[e.get("category") or "uncategorized"].append(amt)
+        by_payer[e.get("paid_by") or "unknown"].append(amt)
+    return (
+        round(math.fsum(amounts), 2),
+        {k: round(math.fsum(v), 2) for k, v in by_category.items()},
+        {k: round(math.fsum(v), 2) for k, v in by_payer.items()},
+    )
+
+async def _group_summary(supabase, group_id: str) -> tuple:
+    """(total, by_category, by_payer) for a group's expenses.
+
+    Prefers the precomputed materialized views (see
+    sql/group_summary_matviews.sql), which hold a handful of rows per
+    group; falls back to fetching the raw expenses and summing in Python
+    when the views are not installed or not yet populated.
+    """
+    try:
+        cat_res, payer_res = await asyncio.gather(
+            supabase.table("group_category_totals").select("category, total").eq("group_id", group_id).execute(),
+            supabase.table("group_payer_totals").select("payer, total").eq("group_id", group_id).execute(),
+        )
+        if cat_res.data or payer_res.data:
+            by_category = {r["category"]: round(float(r.get("total") or 0), 2) for r in cat_res.data or []}
+            by_payer = {r["payer"]: round(float(r.get("total") or 0), 2) for r in payer_res.data or []}
+            return round(math.fsum(by_category.values()), 2), by_category, by_payer
+    except Exception:
+        pass
+    exps = (await supabase.table("expenses").select("id, amount, category, paid_by").eq("group_id", group_id).execute()).data or []
+    return _summarize_expenses(exps)
+
 @router.get("/reports/groups/{group_id}/summary", summary="Group summary report", tags=["Reports"])
-def group_summary_report(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, category, paid_by").eq("group_id", group_id).execute().data or []
-    total = round(sum(float(e.get("amount", 0)) for e in exps), 2)
-    by_category = {}
-    by_payer = {}
-    for e in exps:
-        cat = e.get("category") or "uncategorized"
-        by_category[cat] = round(by_category.get(cat, 0.0) + float(e.get("amount", 0)), 2)
-        payer = e.get("paid_by") or "unknown"
-        by_payer[payer] = round(by_payer.get(payer, 0.0) + float(e.get("amount", 0)), 2)
+async def group_summary_report(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    total, by_category, by_payer = await _group_summary(supabase, group_id)
     return {"total": total, "by_category": by_category, "by_payer": by_payer}
 
 @router.get("/reports/groups/{group_id}/summary.pdf", summary="Group summary report (PDF)", tags=["Reports"])
-def group_summary_report_pdf(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, category, paid_by").eq("group_id", group_id).execute().data or []
-    total = round(sum(float(e.get("amount", 0)) for e in exps), 2)
-    by_category = {}
-    by_payer = {}
-    for e in exps:
-        cat = e.get("category") or "uncategorized"
-        by_category[cat] = round(by_category.get(cat, 0.0) + float(e.get("amount", 0)), 2)
-        payer = e.get("paid_by") or "unknown"
-        by_payer[payer] = round(by_payer.get(payer, 0.0) + float(e.get("amount", 0)), 2)
+async def group_summary_report_pdf(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    total, by_category, by_payer = await _group_summary(supabase, group_id)
     try:
         from reportlab.pdfgen import canvas  # type: ignore
     except Exception:
@@ -464,72 +771,100 @@ def group_summary_report_pdf(group_id: str, user=Depends(get_current_user)):
     c.save()
     buf.seek(0)
     headers = {"Content-Disposition": f"attachment; filename=group_{group_id}_summary.pdf"}
-    return Response(content=buf.getvalue(), media_type="application/pdf", headers=headers)
+    # Stream the buffer as-is; getvalue() would copy the whole PDF again
+    return StreamingResponse(buf, media_type="application/pdf", headers=headers)
 
 @router.get("/reports/users/{user_id}/monthly", summary="User monthly totals", tags=["Reports"])
-def user_monthly_report(user_id: str, month: str = Query(..., description="YYYY-MM"), user=Depends(get_current_user)):
+async def user_monthly_report(user_id: str, month: str = Query(..., description="YYYY-MM"), user=Depends(get_current_user)):
     if user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, date").eq("paid_by", user_id).ilike("date", f"{month}%").execute().data or []
-    paid_total = sum(float(e.get("amount", 0)) for e in exps)
+    supabase = await get_supabase_async_client()
+    # Preferred path: same server-side aggregate as user_balance, filtered
+    # to the month (see sql/rpc_user_balance.sql)
+    try:
+        res = await supabase.rpc("rpc_user_balance", {"uid": user_id, "month_prefix": month}).execute()
+        if res.data:
+            row = res.data[0]
+            paid_total = float(row.get("paid") or 0)
+            owed_total = float(row.get("owed") or 0)
+            net = round(paid_total - owed_total, 2)
+            return {"user_id": user_id, "month": month, "paid": round(paid_total, 2), "owed": round(owed_total, 2), "net": net}
+    except Exception:
+        # Function not installed; fall back to summing rows in Python
+        pass
+    exps = (await supabase.table("expenses").select("id, amount, date").eq("paid_by", user_id).ilike("date", f"{month}%").execute()).data or []
+    paid_c = sum(_to_cents(e.get("amount")) for e in exps)
     exp_ids = [e["id"] for e in exps]
-    owed_total = 0.0
+    owed_c = 0
     if exp_ids:
-        owed_rows = supabase.table("expense_splits").select("amount, expense_id").in_("expense_id", exp_ids).eq("user_id", user_id).execute().data or []
-        owed_total = sum(float(r.get("amount", 0)) for r in owed_rows)
-    net = round(paid_total - owed_total, 2)
-    return {"user_id": user_id, "month": month, "paid": round(paid_total, 2), "owed": round(owed_total, 2), "net": net}
+        owed_rows = (await supabase.table("expense_splits").select("amount, expense_id").in_("expense_id", exp_ids).eq("user_id", user_id).execute()).data or []
+        owed_c = sum(_to_cents(r.get("amount")) for r in owed_rows)
+    return {"user_id": user_id, "month": month, "paid": paid_c / 100, "owed": owed_c / 100, "net": (paid_c - owed_c) / 100}
 
-@router.get("/reports/users/{user_id}/summary.csv", summary="User summary (CSV)", tags=["Reports"])
-def user_summary_csv(user_id: str, user=Depends(get_current_user)):
-    if user_id != user["sub"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    supabase = get_supabase_client()
-    splits = supabase.table("expense_splits").select("expense_id, amount").eq("user_id", user_id).execute().data or []
+async def _user_split_breakdown(supabase, user_id: str):
+    """Totals of the user's splits keyed by group and by category.
+
+    Prefers the joined Postgres aggregate (see
+    sql/rpc_user_split_breakdown.sql), which comes back as a few rows of
+    (group_id, category, amount); falls back to the two-step
+    splits -> expenses fetch when the function is not installed.
+    """
+    try:
+        rows = (await supabase.rpc("rpc_user_split_breakdown", {"uid": user_id}).execute()).data or []
+        by_group = defaultdict(float)
+        by_category = defaultdict(float)
+        for r in rows:
+            amt = float(r.get("amount") or 0)
+            by_group[r.get("group_id") or "unknown"] += amt
+            by_category[r.get("category") or "uncategorized"] += amt
+        return (
+            {k: round(v, 2) for k, v in by_group.items()},
+            {k: round(v, 2) for k, v in by_category.items()},
+        )
+    except Exception:
+        pass
+    splits = (await supabase.table("expense_splits").select("expense_id, amount").eq("user_id", user_id).execute()).data or []
     exp_ids = [s["expense_id"] for s in splits]
-    by_group = {}
-    by_category = {}
+    by_group = defaultdict(float)
+    by_category = defaultdict(float)
     if exp_ids:
-        exps = supabase.table("expenses").select("id, group_id, category").in_("id", exp_ids).execute().data or []
+        exps = (await supabase.table("expenses").select("id, group_id, category").in_("id", exp_ids).execute()).data or []
         info = {e["id"]: e for e in exps}
         for s in splits:
             e = info.get(s["expense_id"]) or {}
-            gid = (e.get("group_id") or "unknown").replace(",", " ")
-            cat = (e.get("category") or "uncategorized").replace(",", " ")
-            by_group[gid] = round(by_group.get(gid, 0.0) + float(s.get("amount", 0)), 2)
-            by_category[cat] = round(by_category.get(cat, 0.0) + float(s.get("amount", 0)), 2)
-    lines = ["type,name,amount"]
-    for gid, amt in by_group.items():
-        lines.append(f"group,{gid},{amt}")
-    for cat, amt in by_category.items():
-        lines.append(f"category,{cat},{amt}")
-    csv_text = "\n".join(lines) + "\n"
+            amt = float(s.get("amount", 0))
+            by_group[e.get("group_id") or "unknown"] += amt
+            by_category[e.get("category") or "uncategorized"] += amt
+    return (
+        {k: round(v, 2) for k, v in by_group.items()},
+        {k: round(v, 2) for k, v in by_category.items()},
+    )
+
+@router.get("/reports/users/{user_id}/summary.csv", summary="User summary (CSV)", tags=["Reports"])
+async def user_summary_csv(user_id: str, user=Depends(get_current_user)):
+    if user_id != user["sub"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    supabase = await get_supabase_async_client()
+    by_group, by_category = await _user_split_breakdown(supabase, user_id)
+    def iter_lines():
+        yield "type,name,amount\n"
+        for gid, amt in by_group.items():
+            yield f"group,{str(gid).replace(',', ' ')},{amt}\n"
+        for cat, amt in by_category.items():
+            yield f"category,{str(cat).replace(',', ' ')},{amt}\n"
     headers = {"Content-Disposition": f"attachment; filename=user_{user_id}_summary.csv"}
-    return Response(content=csv_text, media_type="text/csv", headers=headers)
+    return StreamingResponse(iter_lines(), media_type="text/csv", headers=headers)
 
 @router.get("/reports/users/{user_id}/summary.pdf", summary="User summary (PDF)", tags=["Reports"])
-def user_summary_pdf(user_id: str, user=Depends(get_current_user)):
+async def user_summary_pdf(user_id: str, user=Depends(get_current_user)):
     if user_id != user["sub"]:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         from reportlab.pdfgen import canvas  # type: ignore
     except Exception:
         raise HTTPException(status_code=500, detail="PDF generation not available: install reportlab")
-    supabase = get_supabase_client()
-    splits = supabase.table("expense_splits").select("expense_id, amount").eq("user_id", user_id).execute().data or []
-    exp_ids = [s["expense_id"] for s in splits]
-    by_group = {}
-    by_category = {}
-    if exp_ids:
-        exps = supabase.table("expenses").select("id, group_id, category").in_("id", exp_ids).execute().data or []
-        info = {e["id"]: e for e in exps}
-        for s in splits:
-            e = info.get(s["expense_id"]) or {}
-            gid = (e.get("group_id") or "unknown")
-            cat = (e.get("category") or "uncategorized")
-            by_group[gid] = round(by_group.get(gid, 0.0) + float(s.get("amount", 0)), 2)
-            by_category[cat] = round(by_category.get(cat, 0.0) + float(s.get("amount", 0)), 2)
+    supabase = await get_supabase_async_client()
+    by_group, by_category = await _user_split_breakdown(supabase, user_id)
     buf = io.BytesIO()
     c = canvas.Canvas(buf)
     y = 800
@@ -552,27 +887,20 @@ def user_summary_pdf(user_id: str, user=Depends(get_current_user)):
     c.save()
     buf.seek(0)
     headers = {"Content-Disposition": f"attachment; filename=user_{user_id}_summary.pdf"}
-    return Response(content=buf.getvalue(), media_type="application/pdf", headers=headers)
+    # Stream the buffer as-is; getvalue() would copy the whole PDF again
+    return StreamingResponse(buf, media_type="application/pdf", headers=headers)
 
 @router.get("/reports/groups/{group_id}/summary.csv", summary="Group summary report (CSV)", tags=["Reports"])
-def group_summary_report_csv(group_id: str, user=Depends(get_current_user)):
-    ensure_member_or_403(user["sub"], group_id)
-    supabase = get_supabase_client()
-    exps = supabase.table("expenses").select("id, amount, category, paid_by").eq("group_id", group_id).execute().data or []
-    total = round(sum(float(e.get("amount", 0)) for e in exps), 2)
-    by_category = {}
-    by_payer = {}
-    for e in exps:
-        cat = (e.get("category") or "uncategorized").replace(",", " ")
-        by_category[cat] = round(by_category.get(cat, 0.0) + float(e.get("amount", 0)), 2)
-        payer = (e.get("paid_by") or "unknown").replace(",", " ")
-        by_payer[payer] = round(by_payer.get(payer, 0.0) + float(e.get("amount", 0)), 2)
-    lines = ["type,name,amount"]
-    lines.append(f"total,,{total}")
-    for cat, amt in by_category.items():
-        lines.append(f"category,{cat},{amt}")
-    for payer, amt in by_payer.items():
-        lines.append(f"payer,{payer},{amt}")
-    csv_text = "\n".join(lines) + "\n"
+async def group_summary_report_csv(group_id: str, user=Depends(get_current_user)):
+    await ensure_member_or_403(user["sub"], group_id)
+    supabase = await get_supabase_async_client()
+    total, by_category, by_payer = await _group_summary(supabase, group_id)
+    def iter_lines():
+        yield "type,name,amount\n"
+        yield f"total,,{total}\n"
+        for cat, amt in by_category.items():
+            yield f"category,{str(cat).replace(',', ' ')},{amt}\n"
+        for payer, amt in by_payer.items():
+            yield f"payer,{str(payer).replace(',', ' ')},{amt}\n"
     headers = {"Content-Disposition": f"attachment; filename=group_{group_id}_summary.csv"}
-    return Response(content=csv_text, media_type="text/csv", headers=headers)
+    return StreamingResponse(iter_lines(), media_type="text/csv", headers=headers)
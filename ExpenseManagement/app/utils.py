@@ -1,7 +1,12 @@
 import os
+import threading
+import time
 import jwt
+import httpx
+from cachetools import TTLCache
 from typing import Optional
-from supabase import create_client
+from supabase import create_client, create_async_client
+from supabase.lib.client_options import AsyncClientOptions, SyncClientOptions
 from dotenv import load_dotenv
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -10,48 +15,102 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 _supabase = None
+_supabase_async = None
 _supabase_admin = None
 
 RECEIPTS_BUCKET = os.getenv("RECEIPTS_BUCKET", "receipts")
 
+# Env-derived config read once at import; the client factories sit on every
+# authz check, so they should not re-consult the environment per call.
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SECRET_KEY") or os.getenv("SUPABASE_SERVICE_KEY")
+
+# HTTP transport tuning for the Supabase clients. httpx defaults keep idle
+# connections for only 5s, so bursty traffic churns through TCP/TLS setups.
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "60"))
+SUPABASE_KEEPALIVE = int(os.getenv("SUPABASE_KEEPALIVE", "40"))
+SUPABASE_KEEPALIVE_EXPIRY = int(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_KEEPALIVE,
+        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+    )
+
+def _http_timeout():
+    return httpx.Timeout(connect=5, read=15, write=15, pool=5)
+
+def _tuned_http_client() -> httpx.Client:
+    transport = httpx.HTTPTransport(retries=3, limits=_http_limits())
+    return httpx.Client(transport=transport, timeout=_http_timeout())
+
+def _tuned_async_http_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(retries=3, limits=_http_limits())
+    return httpx.AsyncClient(transport=transport, timeout=_http_timeout())
+
 def get_supabase_client():
     global _supabase
     if _supabase is not None:
         return _supabase
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    if not url or not key:
+    if not SUPABASE_URL or not SUPABASE_KEY:
         raise Exception("SUPABASE_URL and SUPABASE_KEY must be set in .env")
-    _supabase = create_client(url, key)
+    _supabase = create_client(SUPABASE_URL, SUPABASE_KEY, options=SyncClientOptions(httpx_client=_tuned_http_client()))
     return _supabase
 
+async def get_supabase_async_client():
+    """Return the shared async Supabase client (created on first use).
+
+    Async route handlers must use this client so REST roundtrips are awaited
+    instead of blocking the event loop.
+    """
+    global _supabase_async
+    if _supabase_async is not None:
+        return _supabase_async
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise Exception("SUPABASE_URL and SUPABASE_KEY must be set in .env")
+    _supabase_async = await create_async_client(
+        SUPABASE_URL, SUPABASE_KEY, options=AsyncClientOptions(httpx_client=_tuned_async_http_client())
+    )
+    return _supabase_async
+
 def get_supabase_admin():
     global _supabase_admin
     if _supabase_admin is not None:
         return _supabase_admin
-    url = os.getenv("SUPABASE_URL")
-    service_key = os.getenv("SUPABASE_SECRET_KEY") or os.getenv("SUPABASE_SERVICE_KEY")
-    if not url or not service_key:
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         # Fall back to anon client if admin is not configured
         return get_supabase_client()
-    _supabase_admin = create_client(url, service_key)
+    _supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY, options=SyncClientOptions(httpx_client=_tuned_http_client()))
     return _supabase_admin
 
+# Auth caches. Every authenticated endpoint re-decodes the same bearer
+# token and re-syncs the same user row; both answers are stable, so repeat
+# requests within the TTL are served from memory instead of paying an HMAC
+# verify plus a REST round trip.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+_jwt_cache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL)
+_user_seen = TTLCache(maxsize=10_000, ttl=3600)
+_auth_cache_lock = threading.Lock()
+
 def _ensure_user_exists_in_db(user_id: str, email: Optional[str]) -> None:
     """
     Permanent fix: make sure the authenticated user exists in public.users.
-    Safe to call on every request; cheap NO-OP if row already exists.
+    One idempotent upsert per user per hour; a NO-OP when the row exists.
     """
+    with _auth_cache_lock:
+        if user_id in _user_seen:
+            return
     sb = get_supabase_admin()  # use admin to avoid future RLS surprises
     try:
-        res = sb.table("users").select("id").eq("id", user_id).limit(1).execute()
-        if not res.data:
-            payload = {"id": user_id}
-            if email:
-                payload["email"] = email
-            # Optional quality-of-life fields if your schema has them:
-            # payload["is_verified"] = True
-            sb.table("users").insert(payload).execute()
+        payload = {"id": user_id}
+        if email:
+            payload["email"] = email
+        # ON CONFLICT DO NOTHING: replaces the old select-then-insert pair
+        sb.table("users").upsert(payload, on_conflict="id", ignore_duplicates=True).execute()
+        with _auth_cache_lock:
+            _user_seen[user_id] = True
     except Exception:
         # Do not block request flow on user-sync errors
         pass
@@ -59,14 +118,22 @@ def _ensure_user_exists_in_db(user_id: str, email: Optional[str]) -> None:
 # JWT auth dependency for this service
 JWT_SECRET = os.getenv("JWT_SECRET", "mysecret")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Built once; jwt.decode takes the allowed-algorithms list per call
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
 security = HTTPBearer()
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Decodes JWT and guarantees a matching row in public.users (permanent FK fix).
     """
+    token = credentials.credentials
+    with _auth_cache_lock:
+        hit = _jwt_cache.get(token)
+    # Honor the token's own expiry even while the cache entry is fresh
+    if hit is not None and hit.get("exp", float("inf")) > time.time():
+        return hit
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=_JWT_ALGORITHMS)
         payload = dict(payload)
         user_id = payload.get("sub")
         email = payload.get("email")
@@ -74,7 +141,9 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             raise HTTPException(status_code=401, detail="Invalid token: missing sub")
         # PERMANENT FIX: ensure the user row always exists
         _ensure_user_exists_in_db(user_id, email)
-        payload["token"] = credentials.credentials
+        payload["token"] = token
+        with _auth_cache_lock:
+            _jwt_cache[token] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -2,13 +2,34 @@ import os
 from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from app.cache_middleware import GetResponseCacheMiddleware
 from app.routes import expense
+from app.utils import get_supabase_admin, get_supabase_async_client, get_supabase_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warm the client singletons so the first request doesn't pay
+    # client construction; boot still succeeds if config is incomplete.
+    try:
+        get_supabase_client()
+        get_supabase_admin()
+        await get_supabase_async_client()
+    except Exception:
+        pass
+    yield
 
 app = FastAPI(
     title="SplitBuddy Expense Management API",
     description="Create expenses, preview/commit splits, balances, settlements, attachments, and reports.",
+    lifespan=lifespan,
+    # orjson serializes the report/list payloads several times faster than
+    # the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
 # CORS
@@ -22,12 +43,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Cache idempotent GET responses per caller for a few seconds
+app.add_middleware(GetResponseCacheMiddleware)
 app.include_router(expense.router)
 
+# Static liveness payloads, serialized once
+from fastapi import Response
+_ROOT_JSON = b'{"message":"UserGroupManagement microservice running on port 8004"}'
+_HEALTH_JSON = b'{"status":"ok"}'
+
 @app.get("/")
 def read_root():
-    return {"message":"UserGroupManagement microservice running on port 8004"}
+    return Response(content=_ROOT_JSON, media_type="application/json")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return Response(content=_HEALTH_JSON, media_type="application/json")
@@ -0,0 +1,11 @@
+-- Cascade split deletion from expenses. delete_expense relies on this so
+-- removing an expense is one atomic DELETE instead of two round trips
+-- (and orphaned splits are impossible). Apply with the SQL editor or
+-- supabase db push.
+
+ALTER TABLE expense_splits
+    DROP CONSTRAINT IF EXISTS expense_splits_expense_id_fkey;
+
+ALTER TABLE expense_splits
+    ADD CONSTRAINT expense_splits_expense_id_fkey
+    FOREIGN KEY (expense_id) REFERENCES expenses(id) ON DELETE CASCADE;
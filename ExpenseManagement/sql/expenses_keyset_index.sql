@@ -0,0 +1,7 @@
+-- Composite index backing keyset pagination of a group's expenses
+-- (GET /groups/{group_id}/expenses with ?cursor=). Lets Postgres seek
+-- straight to the (date, id) position instead of scanning OFFSET rows.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE INDEX IF NOT EXISTS idx_expenses_group_date_id
+    ON expenses (group_id, date DESC, id DESC);
@@ -0,0 +1,37 @@
+-- Precomputed per-group totals behind the group summary reports. The
+-- handlers read these tiny rows instead of re-aggregating every expense
+-- on each call; refresh on a schedule (pg_cron) or after bulk imports.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS group_category_totals AS
+    SELECT group_id,
+           COALESCE(category, 'uncategorized') AS category,
+           SUM(amount) AS total
+    FROM expenses
+    GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_group_category_totals
+    ON group_category_totals (group_id, category);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS group_payer_totals AS
+    SELECT group_id,
+           paid_by AS payer,
+           SUM(amount) AS total
+    FROM expenses
+    GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_group_payer_totals
+    ON group_payer_totals (group_id, payer);
+
+-- Refresh entry point for cron (unique indexes above allow CONCURRENTLY,
+-- so readers never block):
+--   SELECT cron.schedule('refresh-group-summaries', '*/5 * * * *',
+--                        'SELECT rpc_refresh_group_summaries()');
+CREATE OR REPLACE FUNCTION rpc_refresh_group_summaries()
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    REFRESH MATERIALIZED VIEW CONCURRENTLY group_category_totals;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY group_payer_totals;
+$$;
@@ -0,0 +1,23 @@
+-- Indexes matching the Expense service's query predicates. The keyset
+-- composite for (group_id, date, id) lives in expenses_keyset_index.sql;
+-- these cover the remaining filters used by the route handlers and the
+-- balance RPCs. Run each statement separately (CONCURRENTLY cannot run
+-- inside a transaction) with the SQL editor or psql.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_expenses_paid_by
+    ON expenses (paid_by);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_expense_splits_expense_id
+    ON expense_splits (expense_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_expense_splits_user_id
+    ON expense_splits (user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_settlements_group_created
+    ON settlements (group_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attachments_expense_id
+    ON attachments (expense_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_group_members_group_user
+    ON group_members (group_id, user_id);
@@ -0,0 +1,34 @@
+-- One-round-trip split commit for PUT /expenses/{id}/split. Upserts the
+-- incoming rows on (expense_id, user_id) and deletes only the members no
+-- longer present, inside a single statement, instead of the app's
+-- delete-everything-then-insert pair. Apply with the SQL editor or
+-- supabase db push.
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_expense_splits_expense_user
+    ON expense_splits (expense_id, user_id);
+
+CREATE OR REPLACE FUNCTION rpc_commit_splits(eid uuid, splits jsonb)
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    WITH incoming AS (
+        SELECT (s->>'user_id')::uuid AS user_id,
+               (s->>'amount')::numeric AS amount
+        FROM jsonb_array_elements(splits) s
+    ),
+    removed AS (
+        DELETE FROM expense_splits
+        WHERE expense_id = eid
+          AND user_id NOT IN (SELECT user_id FROM incoming)
+    ),
+    upserted AS (
+        INSERT INTO expense_splits (id, expense_id, user_id, amount, is_settled)
+        SELECT gen_random_uuid(), eid, user_id, amount, false
+        FROM incoming
+        ON CONFLICT (expense_id, user_id)
+        DO UPDATE SET amount = EXCLUDED.amount
+        RETURNING 1
+    )
+    SELECT COUNT(*)::integer FROM upserted
+$$;
@@ -0,0 +1,24 @@
+-- Net balance per member for one group, aggregated inside Postgres.
+-- Backs GET /groups/{group_id}/balances and the settlement suggester: the
+-- result set is one row per member instead of every expense and split row.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE OR REPLACE FUNCTION rpc_group_net_balances(gid uuid)
+RETURNS TABLE(user_id uuid, balance numeric)
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    SELECT u.user_id,
+           ROUND(SUM(u.paid) - SUM(u.owed), 2) AS balance
+    FROM (
+        SELECT e.paid_by AS user_id, e.amount AS paid, 0::numeric AS owed
+        FROM expenses e
+        WHERE e.group_id = gid
+        UNION ALL
+        SELECT s.user_id, 0::numeric, s.amount
+        FROM expense_splits s
+        JOIN expenses e ON e.id = s.expense_id
+        WHERE e.group_id = gid
+    ) u
+    GROUP BY u.user_id
+$$;
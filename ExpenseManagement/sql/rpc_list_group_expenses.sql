@@ -0,0 +1,18 @@
+-- One-roundtrip "authz + data" fetch for GET /groups/{group_id}/expenses.
+-- Returns the group's expenses only when the caller is a member; the
+-- membership check and the data query run inside Postgres instead of as two
+-- separate REST calls. Apply with the SQL editor or supabase db push.
+
+CREATE OR REPLACE FUNCTION rpc_list_group_expenses(uid uuid, gid uuid)
+RETURNS SETOF expenses
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    SELECT e.*
+    FROM expenses e
+    WHERE e.group_id = gid
+      AND EXISTS (
+          SELECT 1 FROM group_members m
+          WHERE m.group_id = gid AND m.user_id = uid
+      )
+$$;
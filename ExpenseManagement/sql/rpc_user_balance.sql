@@ -0,0 +1,28 @@
+-- Server-side aggregate for GET /users/{user_id}/balances and the monthly
+-- report. Sums paid/owed inside Postgres so one small row comes back over
+-- REST instead of every expense and split row. gid and month_prefix are
+-- optional filters. Apply with the SQL editor or supabase db push.
+
+CREATE OR REPLACE FUNCTION rpc_user_balance(uid uuid, gid uuid DEFAULT NULL, month_prefix text DEFAULT NULL)
+RETURNS TABLE(paid numeric, owed numeric)
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    SELECT
+        COALESCE((
+            SELECT SUM(e.amount) FROM expenses e
+            WHERE e.paid_by = uid
+              AND (gid IS NULL OR e.group_id = gid)
+              AND (month_prefix IS NULL OR e.date::text LIKE month_prefix || '%')
+        ), 0) AS paid,
+        COALESCE((
+            SELECT SUM(s.amount)
+            FROM expense_splits s
+            JOIN expenses e ON e.id = s.expense_id
+            WHERE s.user_id = uid
+              AND (gid IS NULL OR e.group_id = gid)
+              -- the monthly report counts only splits of expenses the user
+              -- paid in that month, matching the Python fallback
+              AND (month_prefix IS NULL OR (e.paid_by = uid AND e.date::text LIKE month_prefix || '%'))
+        ), 0) AS owed
+$$;
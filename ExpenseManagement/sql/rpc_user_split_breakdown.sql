@@ -0,0 +1,16 @@
+-- Per-group/per-category totals for one user's splits, joined and grouped
+-- inside Postgres. Backs the user summary CSV/PDF reports: one round trip
+-- and a few aggregate rows instead of splits + expenses fetched separately.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE OR REPLACE FUNCTION rpc_user_split_breakdown(uid uuid)
+RETURNS TABLE(group_id uuid, category text, amount numeric)
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    SELECT e.group_id, e.category, SUM(s.amount) AS amount
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    WHERE s.user_id = uid
+    GROUP BY e.group_id, e.category
+$$;
@@ -0,0 +1,96 @@
+"""Shared pool of long-lived aiosmtplib sessions.
+
+A burst of signups or password resets used to pay one full SMTP
+handshake (connect + STARTTLS + AUTH) per mail. The pool keeps a few
+authenticated sessions open and reuses them, so a burst of N mails
+costs roughly one handshake plus N DATA commands — and stays under
+provider login-rate limits.
+
+aiosmtplib is optional; callers guard the import before delegating here.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "4"))
+
+_pools: dict = {}
+_pools_lock = asyncio.Lock()
+
+
+async def _get_pool(key):
+    # Each server/account gets an idle-session queue plus a semaphore that
+    # caps live connections at the pool size — without it a burst of N
+    # concurrent sends would open N sessions and N logins at once.
+    async with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = (asyncio.Queue(maxsize=EMAIL_POOL_SIZE), asyncio.Semaphore(EMAIL_POOL_SIZE))
+            _pools[key] = pool
+        return pool
+
+
+async def _close_quietly(client):
+    try:
+        await client.quit()
+    except Exception:
+        pass
+
+
+async def _acquire(pool, server, port, username, password):
+    import aiosmtplib
+
+    # Reuse an idle session if it still answers NOOP; otherwise open,
+    # negotiate TLS, and log in a fresh one.
+    while True:
+        try:
+            client = pool.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        try:
+            code, _ = await client.noop()
+            if code == 250:
+                return client
+        except Exception:
+            pass
+        await _close_quietly(client)
+    client = aiosmtplib.SMTP(hostname=server, port=port, start_tls=True)
+    await client.connect()
+    await client.login(username, password)
+    return client
+
+
+async def _release(pool, client):
+    try:
+        pool.put_nowait(client)
+    except asyncio.QueueFull:
+        await _close_quietly(client)
+
+
+async def send_pooled(msg, server, port, username, password):
+    """Send one message over a pooled session; raises on failure."""
+    queue, sem = await _get_pool((server, port, username))
+    async with sem:
+        client = await _acquire(queue, server, port, username, password)
+        try:
+            await client.send_message(msg)
+        except Exception:
+            await _close_quietly(client)
+            raise
+        await _release(queue, client)
+
+
+async def close_all():
+    """Quit every idle pooled session (called at app shutdown)."""
+    async with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for queue, _sem in pools:
+        while True:
+            try:
+                client = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            await _close_quietly(client)
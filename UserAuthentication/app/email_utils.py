@@ -1,42 +1,186 @@
+import logging
+import queue
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import socket
+import threading
+import time
+from email.message import EmailMessage
 import os
 
+logger = logging.getLogger(__name__)
+
+# SMTP settings read once at import; the environment doesn't change
+# post-startup, so the senders shouldn't re-consult it per mail.
+_SMTP_SERVER = os.getenv("SMTP_SERVER")
+_SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+_SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+try:
+    _SMTP_PORT = int(os.getenv("SMTP_PORT") or 587)
+except Exception:
+    _SMTP_PORT = 587
+_SMTP_ENABLED = bool(_SMTP_SERVER and _SMTP_USERNAME and _SMTP_PASSWORD)
+
+# Reusable SMTP connections. A fresh SMTP + starttls() + login() costs three
+# network round-trips plus a TLS handshake per email, and bursts of one-shot
+# logins trip provider rate limits. Connections are pooled per
+# (server, port, username) and retired after a max age or message count.
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_CONN_MAX_AGE = int(os.getenv("SMTP_CONN_MAX_AGE", "100"))
+SMTP_CONN_MAX_MESSAGES = int(os.getenv("SMTP_CONN_MAX_MESSAGES", "100"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# The provider's address is stable for minutes, but getaddrinfo can stall
+# for seconds on a flapping resolver; cache the resolved IP with a TTL.
+SMTP_DNS_TTL = int(os.getenv("SMTP_DNS_TTL", "900"))
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+
+def _resolve(host, port):
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(host)
+        if hit and hit[1] > now:
+            return hit[0]
+    try:
+        infos = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+        ip = infos[0][4][0]
+    except Exception:
+        # Let smtplib resolve (and report) the name itself
+        return host
+    with _dns_lock:
+        _dns_cache[host] = (ip, now + SMTP_DNS_TTL)
+    return ip
+
+
+class _PooledConn:
+    __slots__ = ("conn", "created_at", "sent")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.sent = 0
+
+
+def _get_pool(key):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = queue.Queue(maxsize=SMTP_POOL_SIZE)
+            _pools[key] = pool
+        return pool
+
+
+def _close_quietly(conn):
+    try:
+        conn.quit()
+    except Exception:
+        pass
+
+
+def _acquire(pool, server, port, username, password):
+    # Reuse a pooled connection if it is still young and answers NOOP;
+    # otherwise fall through and open a fresh one.
+    while True:
+        try:
+            entry = pool.get_nowait()
+        except queue.Empty:
+            break
+        if (
+            time.monotonic() - entry.created_at < SMTP_CONN_MAX_AGE
+            and entry.sent < SMTP_CONN_MAX_MESSAGES
+        ):
+            try:
+                code, _ = entry.conn.noop()
+                if code == 250:
+                    return entry
+            except Exception:
+                pass
+        _close_quietly(entry.conn)
+    conn = smtplib.SMTP()
+    # Connect to the cached address but keep the real hostname on the
+    # connection so EHLO and the STARTTLS certificate check still use it.
+    conn._host = server
+    conn.connect(_resolve(server, port), port)
+    conn.starttls()
+    conn.login(username, password)
+    return _PooledConn(conn)
+
+
+def _release(pool, entry):
+    try:
+        pool.put_nowait(entry)
+    except queue.Full:
+        _close_quietly(entry.conn)
+
+
+# Plain-text mail doesn't need a multipart wrapper; EmailMessage also lets
+# smtplib send as_bytes directly instead of round-tripping through str.
+def _build_message(from_email, to_email, subject, body):
+    msg = EmailMessage()
+    msg["From"] = from_email
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg
+
+
 ## Send an email using SMTP credentials from environment variables
 # Be tolerant when SMTP is not configured: do a no-op instead of crashing app startup.
 def send_email(to_email, subject, body):
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port_str = os.getenv("SMTP_PORT")
-    smtp_username = os.getenv("SMTP_USERNAME")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-
     # If SMTP is not configured, log and return without raising
-    if not smtp_server or not smtp_username or not smtp_password:
-        print("SMTP not configured; skipping email send.")
+    if not _SMTP_ENABLED:
+        logger.warning("SMTP not configured; skipping email send.")
         return
 
+    msg = _build_message(_SMTP_USERNAME, to_email, subject, body)
+
+    pool = _get_pool((_SMTP_SERVER, _SMTP_PORT, _SMTP_USERNAME))
     try:
-        smtp_port = int(smtp_port_str) if smtp_port_str else 587
+        entry = _acquire(pool, _SMTP_SERVER, _SMTP_PORT, _SMTP_USERNAME, _SMTP_PASSWORD)
+    except Exception as e:
+        # Log and continue; do not break request flow in non-critical path
+        logger.error("Error sending email: %s", e)
+        return
+    try:
+        entry.conn.send_message(msg)
+        entry.sent += 1
+        _release(pool, entry)
+        logger.info("Email sent to %s", to_email)
+    except Exception as e:
+        _close_quietly(entry.conn)
+        logger.error("Error sending email: %s", e)
+        return
+
+
+# Async variant for use from the event loop (BackgroundTasks runs coroutine
+# tasks directly). SMTP I/O waits cooperatively instead of occupying a
+# threadpool slot; falls back to the pooled sync sender when aiosmtplib is
+# not installed.
+async def send_email_async(to_email, subject, body):
+    try:
+        import aiosmtplib  # type: ignore
     except Exception:
-        smtp_port = 587
+        from fastapi.concurrency import run_in_threadpool
+        await run_in_threadpool(send_email, to_email, subject, body)
+        return
 
-    msg = MIMEMultipart()
-    msg["From"] = smtp_username
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
+    if not _SMTP_ENABLED:
+        logger.warning("SMTP not configured; skipping email send.")
+        return
 
+    msg = _build_message(_SMTP_USERNAME, to_email, subject, body)
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.sendmail(smtp_username, to_email, msg.as_string())
-        server.quit()
-        print("Email sent successfully")
+        # Reuse a long-lived authenticated session from the shared pool
+        # instead of paying a handshake per mail
+        from app import email_pool
+        await email_pool.send_pooled(msg, _SMTP_SERVER, _SMTP_PORT, _SMTP_USERNAME, _SMTP_PASSWORD)
+        logger.info("Email sent to %s", to_email)
     except Exception as e:
         # Log and continue; do not break request flow in non-critical path
-        print(f"Error sending email: {e}")
+        logger.error("Error sending email: %s", e)
         return
 
 
@@ -56,4 +200,4 @@ def send_email(to_email, subject, body):
 #             server.send_message(msg)
 #         print(f"Email sent to {to_email}")
 #     except Exception as e:
-#         print(f"Failed to send email: {e}")
\ No newline at end of file
+#         print(f"Failed to send email: {e}")
@@ -1,10 +1,67 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, BeforeValidator, field_validator
 from pydantic import ValidationInfo
+from typing import Annotated
 import re
 
+# Email fast path: plain ASCII addresses (the overwhelming majority) match
+# one precompiled regex; anything else falls through to email-validator's
+# full parser, same as EmailStr used. The pattern must accept a strict
+# subset of what email-validator does: dot-atom local part (no leading,
+# trailing or consecutive dots) and domain labels that neither start nor
+# end with a hyphen.
+_EMAIL_FAST = re.compile(
+    r'[A-Za-z0-9_%+\-]+(?:\.[A-Za-z0-9_%+\-]+)*'
+    r'@'
+    r'(?:[A-Za-z0-9](?:[A-Za-z0-9\-]{0,61}[A-Za-z0-9])?\.)+'
+    r'[A-Za-z]{2,}'
+)
+
+
+def _fast_email(v):
+    if isinstance(v, str):
+        local, _, domain = v.partition('@')
+        if len(v) <= 254 and len(local) <= 64 and _EMAIL_FAST.fullmatch(v):
+            # Match email-validator's .normalized form: the domain is
+            # case-insensitive and stored lowercased, so lookups by email
+            # stay consistent with rows written under the old validator.
+            return f'{local}@{domain.lower()}'
+        try:
+            from email_validator import validate_email
+            return validate_email(v, check_deliverability=False).normalized
+        except ValueError as e:
+            raise ValueError(f'value is not a valid email address: {e}')
+        except ImportError:
+            pass
+    raise ValueError('value is not a valid email address')
+
+
+Email = Annotated[str, BeforeValidator(_fast_email)]
+
+# Password-policy classifier built once at import: each byte maps to a class
+# bit (upper=1, lower=2, digit=4, special=8) so the validator makes a single
+# pass instead of one regex scan per rule. Non-ASCII bytes count as special,
+# matching the old [^A-Za-z0-9] pattern.
+_CLASS = bytes(
+    1 if 0x41 <= b <= 0x5A      # A-Z
+    else 2 if 0x61 <= b <= 0x7A  # a-z
+    else 4 if 0x30 <= b <= 0x39  # 0-9
+    else 8
+    for b in range(256)
+)
+_ALL_CLASSES = 0xF
+
+# Common passwords that would otherwise satisfy the class rules; checked
+# before bcrypt so bot signups with trivial passwords never reach the
+# expensive hash. Lowercased for a case-insensitive match.
+_COMMON_PASSWORDS = frozenset({
+    "p@ssw0rd", "p@ssword1", "passw0rd!", "password1!", "password123!",
+    "qwerty123!", "welcome123!", "admin@123", "abc@123456", "india@123",
+    "letmein123!", "changeme123!", "iloveyou1!", "monkey@123", "dragon@123",
+})
+
 # This model validates user creation input
 class UserCreate(BaseModel):
-    email: EmailStr
+    email: Email
     password: str
     first_name: str = ""
     last_name: str = ""
@@ -14,13 +71,23 @@ class UserCreate(BaseModel):
     def password_strong(cls, v: str):
         if len(v) < 8:
             raise ValueError('Password must be at least 8 characters')
-        if not re.search(r'[A-Z]', v):
+        # bcrypt only uses the first 72 bytes; don't accept (or hash) more
+        if len(v) > 72:
+            raise ValueError('Password must be at most 72 characters')
+        if v.lower() in _COMMON_PASSWORDS:
+            raise ValueError('Password is too common')
+        mask = 0
+        for b in v.encode('utf-8'):
+            mask |= _CLASS[b]
+            if mask == _ALL_CLASSES:
+                break
+        if not mask & 1:
             raise ValueError('Password must contain an uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if not mask & 2:
             raise ValueError('Password must contain a lowercase letter')
-        if not re.search(r'[0-9]', v):
+        if not mask & 4:
             raise ValueError('Password must contain a digit')
-        if not re.search(r'[^A-Za-z0-9]', v):
+        if not mask & 8:
             raise ValueError('Password must contain a special character')
         return v
 
@@ -28,11 +95,11 @@ class UserCreate(BaseModel):
 class UserProfileUpdate(BaseModel):
     first_name: str | None = None
     last_name: str | None = None
-    email: EmailStr | None = None
+    email: Email | None = None
 
 # This model validates user login input
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: Email
     password: str
 
 # This model is for email verification
@@ -41,20 +108,13 @@ class EmailVerification(BaseModel):
 
 # This model is for password reset request
 class PasswordResetRequest(BaseModel):
-    email: EmailStr
+    email: Email
 
 # This model is for password reset
 class PasswordReset(BaseModel):
     token: str
     new_password: str
 
-# This model validates group member creation input
-
-# This model validates group member creation input for group_members table
-# - group_id and user_id are mandatory (NOT NULL in DB)
-# - phone_number and relationship_tag are optional, but default to '' and 'member' respectively
-#   (so you can set custom values for role or contact info per member)
-
 # This model validates group member creation input for group_members table
 # - group_id, user_id, phone_number, and relationship_tag are all mandatory (NOT NULL in DB)
 #   (when a user accepts an invitation, they must provide phone number and relationship tag)
@@ -73,8 +133,6 @@ class GroupMemberCreate(BaseModel):
             raise ValueError(f"{field_name} is required")
         return v
 
-# This model validates group creation input
-
 # This model validates group creation input for groups table
 # - name and created_by are mandatory (NOT NULL in DB)
 # - description is optional
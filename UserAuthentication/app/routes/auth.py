@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, Form, Body
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, UploadFile, File, Form, Body
 from app.models import (
     UserCreate,
     UserLogin,
@@ -16,58 +16,94 @@ from app.services import (
     update_user_profile,
 )
 from app.utils import supabase, supabase_admin
-from app.email_utils import send_email
+from app.email_utils import send_email_async
 from app.config import JWT_SECRET, REFRESH_TOKEN_SECRET, PROFILE_PIC_BUCKET, SUPABASE_URL, FRONTEND_RESET_URL, FRONTEND_VERIFY_URL
+import asyncio
 import jwt
+import os
+import threading
+import time
+from cachetools import TTLCache
 from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 import base64
 import io
 import uuid
 # Defer heavy imports to runtime to avoid startup crashes in minimal images
 # from PIL import Image, ExifTags
-import json
+import orjson
 from pydantic import BaseModel
 
 router = APIRouter()
 security = HTTPBearer()
 
+# Token helpers shared by signin, the Google callback, and /token/refresh.
+# Secrets are encoded to bytes once at import so PyJWT's HMAC key prep does
+# not re-encode the string on every issued token.
+_JWT_ALG = "HS256"
+_JWT_ALGORITHMS = [_JWT_ALG]
+_JWT_SECRET_BYTES = JWT_SECRET.encode() if isinstance(JWT_SECRET, str) else JWT_SECRET
+_REFRESH_SECRET_BYTES = (
+    REFRESH_TOKEN_SECRET.encode() if isinstance(REFRESH_TOKEN_SECRET, str) else REFRESH_TOKEN_SECRET
+)
+
+
+# Email bodies built once at import; handlers just bind the token/link.
+_VERIFY_BODY_LINK = "Click this link to verify your email: {link}".format
+_VERIFY_BODY_CODE = "Use this code to verify in the app: {token}".format
+_RESET_BODY_LINK = (
+    "Hi,\n\nWe received a request to reset your password.\n"
+    "Click the link to reset: {link}\n\n"
+    "If you didn’t request this, please ignore this email.\n\nThanks!"
+).format
+_RESET_BODY_CODE = (
+    "Hi,\n\nWe received a request to reset your password.\n"
+    "Use this code in the app to reset: {token}\n\n"
+    "If you didn’t request this, please ignore this email.\n\nThanks!"
+).format
+
+
+def _make_access_token(sub: str, email: str | None = None, minutes: int = 30) -> str:
+    payload = {"sub": sub, "exp": datetime.utcnow() + timedelta(minutes=minutes)}
+    if email is not None:
+        payload["email"] = email
+    return jwt.encode(payload, _JWT_SECRET_BYTES, algorithm=_JWT_ALG)
+
+
+def _make_refresh_token(sub: str, days: int = 7) -> str:
+    return jwt.encode(
+        {"sub": sub, "type": "refresh", "exp": datetime.utcnow() + timedelta(days=days)},
+        _REFRESH_SECRET_BYTES,
+        algorithm=_JWT_ALG,
+    )
+
 @router.post("/signup", summary="Register a new user", tags=["Auth"])
-# This endpoint registers a user and sends a verification email with a link
-def signup(user: UserCreate):
+# This endpoint registers a user and sends a verification email with a link.
+# Mail goes out via BackgroundTasks so the response doesn't wait on SMTP.
+def signup(user: UserCreate, background_tasks: BackgroundTasks):
     result = create_user(user)
-    # Fetch verification token from DB
-    user_record = None
-    try:
-        user_record = supabase.table("users").select("verification_token").eq("email", user.email).execute()
-    except Exception as e:
-        print(f"Error fetching verification token: {e}")
-    token = user_record.data[0]["verification_token"] if user_record and user_record.data else None
+    # create_user generated the token; no need to read it back from the DB
+    token = result.pop("verification_token", None)
     # Prefer a frontend verification URL if provided
     if token:
         if FRONTEND_VERIFY_URL:
             verify_link = f"{FRONTEND_VERIFY_URL}?token={token}"
-            send_email(user.email, "Verify your email", f"Click this link to verify your email: {verify_link}")
+            background_tasks.add_task(send_email_async, user.email, "Verify your email", _VERIFY_BODY_LINK(link=verify_link))
         else:
-            send_email(user.email, "Verify your email", f"Use this code to verify in the app: {token}")
+            background_tasks.add_task(send_email_async, user.email, "Verify your email", _VERIFY_BODY_CODE(token=token))
     else:
-        send_email(user.email, "Verify your email", "Verification token not found. Please try again.")
-    return result
+        background_tasks.add_task(send_email_async, user.email, "Verify your email", "Verification token not found. Please try again.")
+    # 202: the user row exists but the verification mail is only queued;
+    # clients can show the "check your inbox" screen immediately.
+    return JSONResponse(status_code=202, content={"email": user.email, **result})
 
 @router.post("/signin", summary="Sign in and get access/refresh tokens", tags=["Auth"])
 def signin(user: UserLogin):
     user_data = authenticate_user(user)
-    access_token = jwt.encode(
-        {"sub": user_data["id"], "email": user_data["email"], "exp": datetime.utcnow() + timedelta(minutes=30)},
-        JWT_SECRET,
-        algorithm="HS256"
-    )
-    refresh_token = jwt.encode(
-        {"sub": user_data["id"], "type": "refresh", "exp": datetime.utcnow() + timedelta(days=7)},
-        REFRESH_TOKEN_SECRET,
-        algorithm="HS256"
-    )
+    access_token = _make_access_token(user_data["id"], user_data["email"])
+    refresh_token = _make_refresh_token(user_data["id"])
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -97,7 +133,7 @@ def google_callback(body: GoogleCallbackBody):
     # Expect frontend to provide email in body for this placeholder
     email = None
     try:
-        payload = json.loads(id_token_val)
+        payload = orjson.loads(id_token_val)
         email = payload.get("email")
         google_sub = payload.get("sub")
     except Exception:
@@ -122,16 +158,8 @@ def google_callback(body: GoogleCallbackBody):
             }).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upsert user: {e}")
-    access_token = jwt.encode(
-        {"sub": user_id, "email": email, "exp": datetime.utcnow() + timedelta(minutes=60)},
-        JWT_SECRET,
-        algorithm="HS256"
-    )
-    refresh_token = jwt.encode(
-        {"sub": user_id, "type": "refresh", "exp": datetime.utcnow() + timedelta(days=7)},
-        REFRESH_TOKEN_SECRET,
-        algorithm="HS256"
-    )
+    access_token = _make_access_token(user_id, email, minutes=60)
+    refresh_token = _make_refresh_token(user_id)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
@@ -139,22 +167,18 @@ def google_callback(body: GoogleCallbackBody):
 async def refresh_token_endpoint(request: Request):
     body = None
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
     except Exception:
         pass
     token = (body or {}).get("refresh_token") if isinstance(body, dict) else None
     if not token:
         raise HTTPException(status_code=400, detail="refresh_token required")
     try:
-        payload = jwt.decode(token, REFRESH_TOKEN_SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, _REFRESH_SECRET_BYTES, algorithms=_JWT_ALGORITHMS)
         if payload.get("type") != "refresh":
             raise HTTPException(status_code=400, detail="Invalid token type")
         # issue new access token only
-        access_token = jwt.encode(
-            {"sub": payload["sub"], "exp": datetime.utcnow() + timedelta(minutes=60)},
-            JWT_SECRET,
-            algorithm="HS256"
-        )
+        access_token = _make_access_token(payload["sub"], minutes=60)
         return {"access_token": access_token, "token_type": "bearer"}
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Refresh token expired")
@@ -168,20 +192,16 @@ def verify_email_endpoint(token: str):
 
 # This endpoint requests password reset
 @router.post("/forgot-password", summary="Request password reset", tags=["Auth"])
-def forgot_password(request: PasswordResetRequest):
+def forgot_password(request: PasswordResetRequest, background_tasks: BackgroundTasks):
     result = request_password_reset(request.email)
     reset_token = result["token"]
     # Prefer linking to the frontend's reset page if configured; otherwise include the token.
-    reset_link = None
     if FRONTEND_RESET_URL:
-        reset_link = f"{FRONTEND_RESET_URL}?token={reset_token}"
-    email_body = (
-        f"Hi,\n\nWe received a request to reset your password.\n"
-        + (f"Click the link to reset: {reset_link}\n\n" if reset_link else f"Use this code in the app to reset: {reset_token}\n\n")
-        + "If you didn’t request this, please ignore this email.\n\nThanks!"
-    )
+        email_body = _RESET_BODY_LINK(link=f"{FRONTEND_RESET_URL}?token={reset_token}")
+    else:
+        email_body = _RESET_BODY_CODE(token=reset_token)
 
-    send_email(request.email, "Password Reset", email_body)
+    background_tasks.add_task(send_email_async, request.email, "Password Reset", email_body)
     return {"msg": "Password reset email sent"}
 
 # This endpoint resets password
@@ -192,9 +212,24 @@ def reset_password_endpoint(reset: PasswordReset):
 ## Removed HTML reset form endpoint; frontend will provide the UI
 
 
+# Decoded-token cache: a session replays the same bearer token on every
+# private-route call, so repeats are a dict hit instead of an HMAC verify.
+# The token's own exp is still honored while the cache entry is fresh.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+_jwt_cache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL)
+_jwt_cache_lock = threading.Lock()
+
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    with _jwt_cache_lock:
+        hit = _jwt_cache.get(token)
+    if hit is not None and hit.get("exp", float("inf")) > time.time():
+        return hit
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, _JWT_SECRET_BYTES, algorithms=_JWT_ALGORITHMS)
+        with _jwt_cache_lock:
+            _jwt_cache[token] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -247,28 +282,136 @@ def update_my_profile(
 
  
 
+def _process_image_vips(content: bytes, ext: str) -> tuple[bytes, bytes]:
+    import pyvips  # type: ignore
+    fmt = ".jpg[Q=85,optimize_coding,strip]" if ext in ("jpg", "jpeg") else ".png[strip]"
+    # thumbnail_buffer decodes at the target size (shrink-on-load) and
+    # auto-rotates from EXIF; "down" never upscales small images
+    img = pyvips.Image.thumbnail_buffer(content, 1024, height=1024, size="down")
+    main_data = img.write_to_buffer(fmt)
+    # Derive the 128px thumb from the already-downscaled image in memory
+    thumb_data = img.thumbnail_image(128, height=128, size="down").write_to_buffer(fmt)
+    return main_data, thumb_data
+
+
+def _process_image_pil(content: bytes, ext: str) -> tuple[bytes, bytes]:
+    from PIL import Image  # type: ignore
+    img = Image.open(io.BytesIO(content))
+    # Auto-rotate based on EXIF Orientation
+    try:
+        exif = img._getexif()
+        if exif:
+            orientation = exif.get(_ORIENTATION_TAG)
+            if orientation == 3:
+                img = img.rotate(180, expand=True)
+            elif orientation == 6:
+                img = img.rotate(270, expand=True)
+            elif orientation == 8:
+                img = img.rotate(90, expand=True)
+    except Exception:
+        pass
+    # Convert to RGB for JPEG if needed
+    if ext in ("jpg", "jpeg") and img.mode not in ("RGB",):
+        img = img.convert("RGB")
+    # Resize to max 1024x1024 preserving aspect ratio
+    img.thumbnail((1024, 1024))
+    main_bytes = io.BytesIO()
+    save_format = "JPEG" if ext in ("jpg", "jpeg") else "PNG"
+    save_kwargs = {"optimize": True}
+    if save_format == "JPEG":
+        save_kwargs.update({"quality": 85})
+    img.save(main_bytes, format=save_format, **save_kwargs)
+    # Create thumbnail 128x128 — in place, since the main image is already
+    # saved; copying first would duplicate the decoded raster
+    img.thumbnail((128, 128))
+    thumb_bytes = io.BytesIO()
+    img.save(thumb_bytes, format=save_format, **save_kwargs)
+    return main_bytes.getvalue(), thumb_bytes.getvalue()
+
+
+# Probed once: importing pyvips can raise OSError (not just ImportError)
+# when the native libvips is missing or broken, so treat any import failure
+# as "use Pillow".
+_pyvips_usable: bool | None = None
+
+
+def _vips_available() -> bool:
+    global _pyvips_usable
+    if _pyvips_usable is None:
+        try:
+            import pyvips  # type: ignore  # noqa: F401
+            _pyvips_usable = True
+        except Exception:
+            _pyvips_usable = False
+    return _pyvips_usable
+
+
+def _process_image(content: bytes, ext: str) -> tuple[bytes, bytes]:
+    """Decode, auto-rotate, strip EXIF, resize to max 1024px and build a
+    128px thumbnail. Prefers libvips (SIMD resampling, tiled streaming —
+    several times faster than Pillow here); falls back to Pillow when
+    pyvips isn't usable."""
+    if _vips_available():
+        return _process_image_vips(content, ext)
+    return _process_image_pil(content, ext)
+
+
+# Hot constants for the profile-picture handlers, built once at import
+_BUCKET_PREFIX = f"{SUPABASE_URL}/storage/v1/object/public/{PROFILE_PIC_BUCKET}/"
+_ORIENTATION_TAG = 274  # fixed EXIF tag id for Orientation
+_ALLOWED_IMAGE_EXTS = frozenset({"jpg", "jpeg", "png"})
+
+# Upload cap, enforced while reading so oversized bodies are rejected
+# after ~5MB instead of being buffered whole. The base64 bound allows for
+# the 4/3 encoding overhead.
+_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+_MAX_IMAGE_B64 = _MAX_IMAGE_BYTES * 4 // 3 + 4
+
+
+def _remove_quietly(bucket, paths):
+    # Old-file cleanup runs as a background task; failures only leave an
+    # orphaned object behind.
+    try:
+        bucket.remove(paths)
+    except Exception:
+        pass
+
+
 # Upload or capture profile picture
 # - Option 1: multipart/form-data with file field 'file'
 # - Option 2: JSON with { "image_base64": "data:image/png;base64,..." } or raw base64 via form field 'image_base64'
 @router.post("/users/me/profile-picture", summary="Upload or capture profile picture", tags=["Profile"])
 async def upload_profile_picture(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile | None = File(default=None),
     image_base64: str | None = Form(default=None),
     user=Depends(get_current_user)
 ):
-    # Import Pillow lazily to avoid import-time failures breaking app startup
-    try:
-        from PIL import Image, ExifTags  # type: ignore
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Image processing unavailable: {e}")
+    # Import image libraries lazily to avoid import-time failures breaking
+    # app startup; pyvips is optional, Pillow is the fallback
+    if not _vips_available():
+        try:
+            from PIL import Image  # type: ignore  # noqa: F401
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Image processing unavailable: {e}")
     user_id = user["sub"]
     content: bytes | None = None
     ext = "png"
 
     # Case 1: multipart file upload (from system)
     if file is not None:
-        content = await file.read()
+        # Read in chunks with a running total; abort as soon as the cap is
+        # crossed rather than buffering the whole body first
+        buf = bytearray()
+        while True:
+            chunk = await file.read(65536)
+            if not chunk:
+                break
+            buf += chunk
+            if len(buf) > _MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=413, detail="Image too large (max 5MB)")
+        content = bytes(buf)
         # Infer extension from filename or content type
         if file.filename and "." in file.filename:
             ext = file.filename.rsplit(".", 1)[-1].lower()
@@ -287,28 +430,40 @@ async def upload_profile_picture(
                     ext = header.split("image/")[-1].split(";")[0]
                 except Exception:
                     pass
+        if len(b64) > _MAX_IMAGE_B64:
+            raise HTTPException(status_code=413, detail="Image too large (max 5MB)")
         try:
             content = base64.b64decode(b64)
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid base64 image data")
 
-    # Case 2b: JSON body base64
+    # Case 2b: JSON body base64 — only attempted for JSON requests; after a
+    # multipart/form parse the body is consumed and re-reading it would
+    # just raise
     if content is None:
-        try:
-            body = await request.json()
-            b64 = body.get("image_base64") if isinstance(body, dict) else None
-            if b64:
-                if "," in b64:
-                    header, b64 = b64.split(",", 1)
-                    if "image/" in header and ";base64" in header:
-                        try:
-                            ext = header.split("image/")[-1].split(";")[0]
-                        except Exception:
-                            pass
+        b64 = None
+        ctype = request.headers.get("content-type", "")
+        if ctype.startswith("application/json"):
+            try:
+                body = orjson.loads(await request.body())
+                b64 = body.get("image_base64") if isinstance(body, dict) else None
+            except Exception:
+                # No JSON or invalid; ignore
+                b64 = None
+        if b64:
+            if "," in b64:
+                header, b64 = b64.split(",", 1)
+                if "image/" in header and ";base64" in header:
+                    try:
+                        ext = header.split("image/")[-1].split(";")[0]
+                    except Exception:
+                        pass
+            if len(b64) > _MAX_IMAGE_B64:
+                raise HTTPException(status_code=413, detail="Image too large (max 5MB)")
+            try:
                 content = base64.b64decode(b64)
-        except Exception:
-            # No JSON or invalid; ignore
-            pass
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid base64 image data")
 
     if content is None:
         raise HTTPException(status_code=400, detail="Provide a file or image_base64")
@@ -325,57 +480,24 @@ async def upload_profile_picture(
         return None
 
     sig_ext = sniff_ext(content)
-    allowed = {"jpg", "jpeg", "png"}
     if sig_ext:
         ext = sig_ext  # prefer signature over filename/content-type
-    if ext not in allowed:
+    if ext not in _ALLOWED_IMAGE_EXTS:
         raise HTTPException(status_code=415, detail="Unsupported image type. Please upload a JPG or PNG.")
     # If signature exists and doesn't match allowed types, reject
-    if sig_ext is None and ext in {"jpg", "jpeg", "png"}:
+    if sig_ext is None and ext in _ALLOWED_IMAGE_EXTS:
         # Could not verify signature; be strict and require valid image bytes
         raise HTTPException(status_code=400, detail="Invalid image data. Please upload a valid JPG or PNG.")
 
-    # Validate size (e.g., <= 5MB)
-    if len(content) > 5 * 1024 * 1024:
+    # Validate decoded size (the base64 bound above is approximate)
+    if len(content) > _MAX_IMAGE_BYTES:
         raise HTTPException(status_code=413, detail="Image too large (max 5MB)")
 
-    # Process image: auto-rotate, strip EXIF, resize to a sensible max, and create thumbnail
+    # Process image: auto-rotate, strip EXIF, resize to a sensible max, and
+    # create thumbnail — on the threadpool, since decode/resample is the CPU
+    # hot spot of this request
     try:
-        img = Image.open(io.BytesIO(content))
-        # Auto-rotate based on EXIF Orientation
-        try:
-            exif = img._getexif()
-            if exif:
-                orientation_key = next(k for k, v in ExifTags.TAGS.items() if v == 'Orientation')
-                orientation = exif.get(orientation_key)
-                if orientation == 3:
-                    img = img.rotate(180, expand=True)
-                elif orientation == 6:
-                    img = img.rotate(270, expand=True)
-                elif orientation == 8:
-                    img = img.rotate(90, expand=True)
-        except Exception:
-            pass
-        # Convert to RGB for JPEG if needed
-        if ext in ("jpg", "jpeg") and img.mode not in ("RGB",):
-            img = img.convert("RGB")
-        # Resize to max 1024x1024 preserving aspect ratio
-        max_size = (1024, 1024)
-        img.thumbnail(max_size)
-        # Save processed main image to bytes
-        main_bytes = io.BytesIO()
-        save_format = "JPEG" if ext in ("jpg", "jpeg") else "PNG"
-        save_kwargs = {"optimize": True}
-        if save_format == "JPEG":
-            save_kwargs.update({"quality": 85})
-        img.save(main_bytes, format=save_format, **save_kwargs)
-        main_bytes.seek(0)
-        # Create thumbnail 128x128
-        thumb = img.copy()
-        thumb.thumbnail((128, 128))
-        thumb_bytes = io.BytesIO()
-        thumb.save(thumb_bytes, format=save_format, **save_kwargs)
-        thumb_bytes.seek(0)
+        main_data, thumb_data = await run_in_threadpool(_process_image, content, ext)
     except Exception:
         raise HTTPException(status_code=400, detail="Could not process image. Please upload a valid JPG or PNG.")
 
@@ -386,33 +508,40 @@ async def upload_profile_picture(
     try:
         storage_client = supabase_admin if supabase_admin is not None else supabase
         bucket = storage_client.storage.from_(PROFILE_PIC_BUCKET)
-        # Best-effort cleanup of previously uploaded files in our bucket
-        try:
-            current = supabase.table("users").select("profile_picture").eq("id", user_id).execute()
-            current_url = (current.data[0]["profile_picture"] if current and current.data else None)
-            if current_url and isinstance(current_url, str):
-                prefix = f"{SUPABASE_URL}/storage/v1/object/public/{PROFILE_PIC_BUCKET}/"
-                if current_url.startswith(prefix):
-                    old_path = current_url[len(prefix):]
-                    # Derive thumbnail path if it follows the _thumb pattern
-                    if "." in old_path:
-                        base, ext_old = old_path.rsplit(".", 1)
-                        old_thumb = f"{base}_thumb.{ext_old}"
-                        try:
-                            bucket.remove([old_path, old_thumb])
-                        except Exception:
-                            pass
-        except Exception:
-            pass
         # Map to canonical content types
         content_type = "image/jpeg" if ext in ("jpg", "jpeg") else "image/png"
-        bucket.upload(filename, main_bytes.getvalue(), {"content_type": content_type})
-        bucket.upload(thumbname, thumb_bytes.getvalue(), {"content_type": content_type})
+        # The two objects are independent; upload them concurrently so the
+        # storage step costs max, not sum, of the round trips
+        await asyncio.gather(
+            run_in_threadpool(bucket.upload, filename, main_data, {"content_type": content_type}),
+            run_in_threadpool(bucket.upload, thumbname, thumb_data, {"content_type": content_type}),
+        )
         # Build a public URL
         public_url = bucket.get_public_url(filename)
         thumb_url = bucket.get_public_url(thumbname)
-        # Persist URL to user profile
-        supabase.table("users").update({"profile_picture": public_url}).eq("id", user_id).execute()
+        # Persist the new URL and learn the previous one in a single round
+        # trip when update_profile_picture is deployed
+        # (sql/update_profile_picture.sql); otherwise fall back to
+        # select-then-update.
+        old_url = None
+        try:
+            res = supabase.rpc("update_profile_picture", {"uid": user_id, "new_url": public_url}).execute()
+            old_url = res.data[0] if isinstance(res.data, list) and res.data else res.data
+        except Exception:
+            try:
+                current = supabase.table("users").select("profile_picture").eq("id", user_id).execute()
+                old_url = (current.data[0]["profile_picture"] if current and current.data else None)
+            except Exception:
+                old_url = None
+            supabase.table("users").update({"profile_picture": public_url}).eq("id", user_id).execute()
+        # Best-effort cleanup of the previous files, after the response
+        if old_url and isinstance(old_url, str):
+            if old_url.startswith(_BUCKET_PREFIX):
+                old_path = old_url[len(_BUCKET_PREFIX):]
+                # Derive thumbnail path if it follows the _thumb pattern
+                if "." in old_path:
+                    base, ext_old = old_path.rsplit(".", 1)
+                    background_tasks.add_task(_remove_quietly, bucket, [old_path, f"{base}_thumb.{ext_old}"])
         return {"url": public_url, "thumbnail_url": thumb_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
@@ -431,9 +560,8 @@ def delete_profile_picture(user=Depends(get_current_user)):
         storage_client = supabase_admin if supabase_admin is not None else supabase
         bucket = storage_client.storage.from_(PROFILE_PIC_BUCKET)
         # If the URL points to our public bucket, derive the storage path and thumbnail path
-        prefix = f"{SUPABASE_URL}/storage/v1/object/public/{PROFILE_PIC_BUCKET}/"
-        if isinstance(current_url, str) and current_url.startswith(prefix):
-            old_path = current_url[len(prefix):]
+        if isinstance(current_url, str) and current_url.startswith(_BUCKET_PREFIX):
+            old_path = current_url[len(_BUCKET_PREFIX):]
             paths = [old_path]
             if "." in old_path:
                 base, ext = old_path.rsplit(".", 1)
@@ -461,8 +589,7 @@ def get_profile_picture(user=Depends(get_current_user)):
     url = (res.data[0]["profile_picture"] if res and res.data else None)
     thumb_url = None
     if url and isinstance(url, str):
-        prefix = f"{SUPABASE_URL}/storage/v1/object/public/{PROFILE_PIC_BUCKET}/"
-        if url.startswith(prefix) and "." in url:
+        if url.startswith(_BUCKET_PREFIX) and "." in url:
             base, ext = url.rsplit(".", 1)
             thumb_url = f"{base}_thumb.{ext}"
     return {"url": url, "thumbnail_url": thumb_url}
@@ -488,12 +615,9 @@ def get_my_settings(user=Depends(get_current_user)):
 def update_my_settings(body: UserSettings, user=Depends(get_current_user)):
     data = {k: v for k, v in body.model_dump().items() if v is not None}
     data["user_id"] = user["sub"]
-    # Upsert-like behavior
-    existing = supabase.table("user_settings").select("user_id").eq("user_id", user["sub"]).execute()
-    if existing.data:
-        supabase.table("user_settings").update(data).eq("user_id", user["sub"]).execute()
-    else:
-        supabase.table("user_settings").insert(data).execute()
+    # One round trip; relies on the unique index on user_settings.user_id
+    # (sql/user_settings_unique.sql)
+    supabase.table("user_settings").upsert(data, on_conflict="user_id").execute()
     return {"msg": "Settings saved"}
 
 # (Phone/OTP endpoints removed; email-only auth retained)
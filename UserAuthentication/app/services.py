@@ -22,11 +22,33 @@ from dateutil.parser import parse as parse_datetime
 
 ## Create a new user and send verification email
 def create_user(user: UserCreate):
+    hashed = hash_password(user.password)
+    verification_token = str(uuid.uuid4())
+    # One round trip when the rpc_create_user function is deployed
+    # (sql/rpc_create_user.sql): the insert and the duplicate check happen
+    # atomically in the database. Falls back to the two-step path otherwise.
+    try:
+        res = supabase.rpc("rpc_create_user", {
+            "p_email": user.email,
+            "p_password_hash": hashed,
+            "p_verification_token": verification_token,
+            "p_first_name": user.first_name,
+            "p_last_name": user.last_name,
+        }).execute()
+        created = res.data[0] if isinstance(res.data, list) else res.data
+        if created:
+            return {
+                "msg": "User created successfully. Please verify your email.",
+                "verification_token": verification_token,
+            }
+        raise HTTPException(status_code=400, detail="Email already registered")
+    except HTTPException:
+        raise
+    except Exception:
+        pass
     existing = supabase.table("users").select("id").eq("email", user.email).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed = hash_password(user.password)
-    verification_token = str(uuid.uuid4())
     supabase.table("users").insert({
         "email": user.email,
         "password_hash": hashed,
@@ -35,8 +57,12 @@ def create_user(user: UserCreate):
         "first_name": user.first_name,
         "last_name": user.last_name,
     }).execute()
-    # TODO: Send verification email with token
-    return {"msg": "User created successfully. Please verify your email."}
+    # The caller sends the verification email; returning the token here
+    # saves it a second round-trip to read back the row just inserted.
+    return {
+        "msg": "User created successfully. Please verify your email.",
+        "verification_token": verification_token,
+    }
 
 ## Authenticate user credentials and check verification
 def authenticate_user(user: UserLogin):
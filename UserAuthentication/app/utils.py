@@ -1,21 +1,49 @@
+import os
+
+import httpx
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from app.config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_SERVICE_KEY
 from passlib.context import CryptContext
 
+# HTTP transport tuning, mirroring the Expense service: httpx drops idle
+# connections after 5s by default, so without this every auth burst pays
+# fresh TCP/TLS setups to Supabase.
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "60"))
+SUPABASE_KEEPALIVE = int(os.getenv("SUPABASE_KEEPALIVE", "40"))
+SUPABASE_KEEPALIVE_EXPIRY = int(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+
+
+def _tuned_http_client() -> httpx.Client:
+    transport = httpx.HTTPTransport(
+        retries=3,
+        limits=httpx.Limits(
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_KEEPALIVE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(connect=5, read=15, write=15, pool=5))
+
+
 # Initialize clients lazily/tolerantly so missing env vars don't crash app startup
 supabase: Client | None = None
 supabase_admin: Client | None = None
 
 try:
     if SUPABASE_URL and SUPABASE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase = create_client(
+            SUPABASE_URL, SUPABASE_KEY, options=SyncClientOptions(httpx_client=_tuned_http_client())
+        )
 except Exception:
     supabase = None
 
 # Optional privileged client for Storage writes when RLS blocks anon key
 try:
     if SUPABASE_URL and SUPABASE_SERVICE_KEY:
-        supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        supabase_admin = create_client(
+            SUPABASE_URL, SUPABASE_SERVICE_KEY, options=SyncClientOptions(httpx_client=_tuned_http_client())
+        )
 except Exception:
     supabase_admin = None
 
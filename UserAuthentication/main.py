@@ -1,11 +1,46 @@
 from fastapi import FastAPI
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from app import email_pool
 from app.routes import auth
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse
 
 
-app = FastAPI()
+def _setup_queue_logging():
+    # Push log formatting and I/O onto a dedicated listener thread so request
+    # handlers never block on the stream lock. Idempotent across reloads.
+    root = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    log_queue = queue.SimpleQueue()
+    sinks = root.handlers[:] or [logging.StreamHandler()]
+    listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener.start()
+    atexit.register(listener.stop)
+
+
+_setup_queue_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Quit any idle pooled SMTP sessions so shutdown doesn't strand sockets
+    try:
+        await email_pool.close_all()
+    except Exception:
+        pass
+
+
+# orjson serializes responses several times faster than the stdlib encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS: allow only configured frontend origins (comma-separated). Use * only for local dev.
 _origins = os.getenv("FRONTEND_ORIGINS", "*")
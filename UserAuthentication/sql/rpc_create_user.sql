@@ -0,0 +1,20 @@
+-- One-round-trip signup: insert the user and report whether the row was
+-- created, so the service doesn't pay a SELECT-then-INSERT pair per signup.
+-- Relies on the unique constraint on users.email (created below if absent).
+-- Apply with the SQL editor or supabase db push.
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_unique ON users (email);
+
+CREATE OR REPLACE FUNCTION rpc_create_user(
+    p_email text,
+    p_password_hash text,
+    p_verification_token text,
+    p_first_name text DEFAULT '',
+    p_last_name text DEFAULT ''
+) RETURNS boolean
+LANGUAGE sql AS $$
+    INSERT INTO users (email, password_hash, is_verified, verification_token, first_name, last_name)
+    VALUES (p_email, p_password_hash, false, p_verification_token, p_first_name, p_last_name)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING true;
+$$;
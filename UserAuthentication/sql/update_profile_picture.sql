@@ -0,0 +1,14 @@
+-- Swap a user's profile picture URL and hand back the previous one in the
+-- same statement, so the service doesn't pay a SELECT round trip before the
+-- UPDATE just to find the old file to delete.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE OR REPLACE FUNCTION update_profile_picture(uid uuid, new_url text)
+RETURNS text
+LANGUAGE sql AS $$
+    UPDATE users u
+    SET profile_picture = new_url
+    FROM (SELECT profile_picture FROM users WHERE id = uid) old
+    WHERE u.id = uid
+    RETURNING old.profile_picture;
+$$;
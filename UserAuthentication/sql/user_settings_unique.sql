@@ -0,0 +1,7 @@
+-- The settings endpoint upserts with on_conflict=user_id, which needs a
+-- unique constraint on that column. A no-op if the table already declares
+-- user_id as its primary key.
+-- Apply with the SQL editor or supabase db push.
+
+CREATE UNIQUE INDEX IF NOT EXISTS user_settings_user_id_unique
+    ON user_settings (user_id);
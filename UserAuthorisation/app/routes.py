@@ -42,8 +42,9 @@ def introspect(user=Depends(get_current_user)):
 def is_member(group_id: str, user=Depends(get_current_user)):
     """Return whether the current user is a member of the given group."""
     supabase = get_supabase_client()
-    res = supabase.table("group_members").select("user_id").eq("group_id", group_id).eq("user_id", user["sub"]).execute()
-    return {"is_member": bool(res.data)}
+    # Existence only: HEAD with count=exact returns no body over the wire
+    res = supabase.table("group_members").select("user_id", count="exact", head=True).eq("group_id", group_id).eq("user_id", user["sub"]).execute()
+    return {"is_member": bool(res.count)}
 
 @router.get("/authz/groups/{group_id}/is-owner", summary="Check if current user owns the group", tags=["AuthZ"]) 
 def is_owner(group_id: str, user=Depends(get_current_user)):
@@ -62,8 +63,8 @@ def expense_in_group(expense_id: str, user=Depends(get_current_user)):
     if not exp.data:
         return {"in_group": False}
     gid = exp.data[0]["group_id"]
-    mem = supabase.table("group_members").select("user_id").eq("group_id", gid).eq("user_id", user["sub"]).execute()
-    return {"in_group": bool(mem.data)}
+    mem = supabase.table("group_members").select("user_id", count="exact", head=True).eq("group_id", gid).eq("user_id", user["sub"]).execute()
+    return {"in_group": bool(mem.count)}
 
 # The POST /authz/decision endpoint has been removed to keep this service read-only.
 
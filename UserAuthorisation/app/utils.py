@@ -1,5 +1,7 @@
 import os
+import httpx
 from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
 
 # Load environment variables from this service's .env
@@ -7,6 +9,18 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 _supabase = None
 
+def _tuned_http_client() -> httpx.Client:
+    """Bounded pool with long keepalive for the PostgREST session (the httpx
+    default expires idle connections after 5s). Same env knobs as the other
+    services."""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "60")),
+        max_keepalive_connections=int(os.getenv("SUPABASE_KEEPALIVE", "40")),
+        keepalive_expiry=int(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60")),
+    )
+    transport = httpx.HTTPTransport(retries=3, limits=limits)
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(connect=5, read=15, write=15, pool=5))
+
 def get_supabase_client():
     global _supabase
     if _supabase is not None:
@@ -15,5 +29,5 @@ def get_supabase_client():
     supabase_key = os.getenv("SUPABASE_KEY")
     if not supabase_url or not supabase_key:
         raise Exception("SUPABASE_URL and SUPABASE_KEY must be set in .env")
-    _supabase = create_client(supabase_url, supabase_key)
+    _supabase = create_client(supabase_url, supabase_key, options=SyncClientOptions(httpx_client=_tuned_http_client()))
     return _supabase
@@ -11,8 +11,10 @@ import os
 
 def is_member(user_id: str, group_id: str) -> bool:
     """Return True if the user belongs to the given group."""
-    res = supabase.table("group_members").select("user_id").eq("group_id", group_id).eq("user_id", user_id).execute()
-    return bool(res.data)
+    # head=True issues a body-less HEAD request; the row count rides back in
+    # the Content-Range header, so no JSON is transferred or parsed
+    res = supabase.table("group_members").select("user_id", count="exact", head=True).eq("group_id", group_id).eq("user_id", user_id).execute()
+    return bool(res.count)
 
 def is_owner(user_id: str, group_id: str) -> bool:
     """Return True if the user is the group's creator (owner)."""
@@ -1,6 +1,8 @@
 import os
 import jwt
+import httpx
 from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -10,13 +12,35 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 
-# Create and return a Supabase client using environment variables
+_supabase = None
+
+def _tuned_http_client() -> httpx.Client:
+    """Bounded connection pool with long keepalive for the PostgREST session.
+
+    httpx's default 5s keepalive expiry churns connections between bursts;
+    these limits mirror the Expense service's tuning and share its env knobs.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "60")),
+        max_keepalive_connections=int(os.getenv("SUPABASE_KEEPALIVE", "40")),
+        keepalive_expiry=int(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60")),
+    )
+    transport = httpx.HTTPTransport(retries=3, limits=limits)
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(connect=5, read=15, write=15, pool=5))
+
+# Create (once) and return a Supabase client using environment variables.
+# Reusing one client keeps a persistent HTTP session instead of paying the
+# socket/TLS setup cost on every call.
 def get_supabase_client():
+    global _supabase
+    if _supabase is not None:
+        return _supabase
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_KEY")
     if not supabase_url or not supabase_key:
         raise Exception("SUPABASE_URL and SUPABASE_KEY must be set")
-    return create_client(supabase_url, supabase_key)
+    _supabase = create_client(supabase_url, supabase_key, options=SyncClientOptions(httpx_client=_tuned_http_client()))
+    return _supabase
 
 
 # Create a global Supabase client instance for reuse across the service